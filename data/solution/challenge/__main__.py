@@ -0,0 +1,29 @@
+import argparse
+
+from challenge import backends, report
+
+# --------------------------------------------------------------
+# Command line entry point of the query backends
+# --------------------------------------------------------------
+# Answers the four queries of a data directory with one backend (see
+# challenge/backends) and prints the report of challenge/report.py.
+# Only the selected backend and its framework are imported.
+#
+# Usage: python -m challenge [--backend python|numpy|pandas|duckdb|spark]
+#                            [--data DIR] [--days N] [--top-k K]
+#   (run from data/solution)
+# --------------------------------------------------------------
+
+parser = argparse.ArgumentParser(prog='python -m challenge')
+parser.add_argument('--backend', choices=backends.BACKENDS, default='python',
+                    help='query backend (default python, see challenge/backends)')
+parser.add_argument('--data', default='.', help='directory of the CSV files')
+parser.add_argument('--days', type=int, default=report.CONSECUTIVE_DAYS,
+                    help=f'number of consecutive days of the window (default {report.CONSECUTIVE_DAYS})')
+parser.add_argument('--top-k', type=int, default=1,
+                    help='number of top submitters per day of Query 3 (default 1)')
+args = parser.parse_args()
+if args.days < 1 or args.top_k < 1:
+    parser.error('--days and --top-k must be at least 1')
+
+report.print_results(backends.run(args.backend, args.data, args.days, args.top_k))
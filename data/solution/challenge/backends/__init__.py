@@ -0,0 +1,53 @@
+import importlib
+import os
+import sys
+
+from challenge.report import CONSECUTIVE_DAYS
+
+# --------------------------------------------------------------
+# Query backends
+# --------------------------------------------------------------
+# Every backend is a module with the same entry point:
+#
+#   run(source_dir, days, top_k) -> challenge.report.Results
+#
+# which loads the tables of source_dir (from the columnar cache if it
+# is fresh, see challenge/cache.py) and answers the four queries.
+#
+#   python  -> streaming engine of the Python solution (no dependency)
+#   numpy   -> NumPy engine of the Python solution
+#   pandas  -> in-memory DataFrames of the pandas solution
+#   duckdb  -> SQL of the sql solution
+#   spark   -> single-scan jobs of the pyspark solution
+#
+# A backend module, and so its framework, is only imported when the
+# backend is selected: importing this package (and the CLI, see
+# __main__.py) costs no framework import at all.
+# --------------------------------------------------------------
+
+BACKENDS = {
+    'python': 'challenge.backends.python',
+    'numpy': 'challenge.backends.numpy',
+    'pandas': 'challenge.backends.pandas',
+    'duckdb': 'challenge.backends.duckdb',
+    'spark': 'challenge.backends.spark',
+}
+
+
+# Makes the top-level modules of a solution importable: they live in
+# data/solution/<solution>, or next to the challenge package in the
+# application directory of the Docker image of the solution
+def use_solution(solution, module):
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    for directory in (os.path.join(root, solution), root):
+        if os.path.exists(os.path.join(directory, module)):
+            if directory not in sys.path:
+                sys.path.append(directory)
+            return
+    raise ImportError(f'{module} of the {solution} solution not found')
+
+def load(name):
+    return importlib.import_module(BACKENDS[name])
+
+def run(name, source_dir='.', days=CONSECUTIVE_DAYS, top_k=1):
+    return load(name).run(source_dir, days, top_k)
@@ -0,0 +1,155 @@
+import json
+import os
+from datetime import timedelta
+
+import duckdb
+
+from challenge import cache, profiling
+from challenge.report import Results, check_rows
+
+# --------------------------------------------------------------
+# DuckDB backend: the SQL of the sql solution
+# --------------------------------------------------------------
+# The joined dataset is kept between runs in an on-disk database next
+# to the CSV files (table `data`, sorted by student_id, test_id and
+# submission_time) and only built again when the size or mtime of a
+# CSV file changed (table `sources`).
+# --------------------------------------------------------------
+
+# On-disk database that keeps the joined dataset between runs
+DATABASE = 'challenge.duckdb'
+
+
+# Returns the SQL source of a table: the columnar cache if it is fresh
+# (see challenge/cache.py), otherwise its CSV file
+def table_source(source_dir, name):
+    path = cache.parquet_path(source_dir, name)
+    return f"read_parquet('{path}')" if path else f"read_csv('{os.path.join(source_dir, name + '.csv')}')"
+
+# Connects to the database of source_dir, building the joined dataset into
+# the table `data` unless it was already built from the same CSV files
+def connect(source_dir):
+    con = duckdb.connect(os.path.join(source_dir, DATABASE))
+    sources = json.dumps({name: [os.stat(path).st_size, os.stat(path).st_mtime_ns]
+                          for name in ['students', 'tests', 'submissions', 'grades']
+                          for path in [os.path.join(source_dir, f'{name}.csv')]})
+    con.execute("CREATE TABLE IF NOT EXISTS sources (fingerprint VARCHAR)")
+    if con.execute("SELECT fingerprint FROM sources").fetchone() != (sources,):
+        with profiling.stage('load & join') as stage:
+            con.execute("BEGIN TRANSACTION")
+            con.execute(f"""
+                CREATE OR REPLACE TABLE data AS
+                SELECT A.submission_id
+                    , B.student_id
+                    , C.test_id
+                    , A.submission_time
+                    , CAST(A.submission_time AS date) AS submission_date
+                    , D.grade
+                FROM {table_source(source_dir, 'submissions')} AS A
+                INNER JOIN {table_source(source_dir, 'students')} AS B ON A.student_id = B.student_id
+                INNER JOIN {table_source(source_dir, 'tests')} AS C ON A.test_id = C.test_id
+                INNER JOIN {table_source(source_dir, 'grades')} AS D ON A.submission_id = D.submission_id
+                ORDER BY B.student_id, C.test_id, A.submission_time
+            """)
+            stage.rows_out = con.sql("SELECT COUNT(*) FROM data").fetchone()[0]
+            con.execute("DELETE FROM sources")
+            con.execute("INSERT INTO sources VALUES (?)", [sources])
+            con.execute("COMMIT")
+    return con
+
+# Validate (stops at the first row)
+def has_rows(con):
+    return con.sql("SELECT 1 FROM data LIMIT 1").fetchone() is not None
+
+# First date of the last days of data
+def window_start(con, days):
+    return con.sql("SELECT MAX(submission_date) FROM data").fetchone()[0] - timedelta(days=days-1)
+
+# Query 1 & 2
+#   Instead of selecting the distinct (student_id, submission_date) pairs, every
+#   student gets a fixed-width bitmask of `days` bits (bitstring_agg), where
+#   bit i is set if the student submitted on submission_start + i days.
+#   The students with all bits set submitted on each day of the window.
+def count_every_day(con, submission_start, days, condition):
+    return con.sql(f"""
+        SELECT COUNT(*)
+        FROM (
+            SELECT bitstring_agg(submission_date - DATE '{submission_start}',
+                                 0, {days-1}) AS days
+            FROM data
+            WHERE submission_date >= DATE '{submission_start}'
+                AND {condition}
+            GROUP BY student_id
+        )
+        WHERE bit_count(days) = {days}
+    """).fetchone()[0]
+
+# Query 3
+#   The top_k students with the most submissions for each day of the window
+#   (the lowest student_ids on ties), ordered by date and rank. The relation
+#   is lazy, so the query runs when it is fetched.
+def query3(con, submission_start, top_k=1):
+    return con.sql(f"""
+        WITH source AS
+        (
+            SELECT student_id, submission_date, COUNT(*) AS submission_count
+            FROM data
+            WHERE submission_date >= DATE '{submission_start}'
+            GROUP BY student_id, submission_date
+        )
+        , sorted AS
+        (
+            SELECT *
+                , ROW_NUMBER() OVER (
+                    PARTITION BY submission_date
+                    ORDER BY submission_count DESC, student_id
+                  ) AS sort
+            FROM source
+        )
+        SELECT submission_date, student_id, submission_count AS count
+        FROM sorted
+        WHERE sort <= {top_k}
+        ORDER BY submission_date, sort
+    """)
+
+# Query 4
+#   Processing steps (see rules B-D in challenge/report.py):
+#     1. One GROUP BY (student_id, test_id) keeps a single record per pair: the
+#        grade of the last valid submission (arg_max over the valid rows only,
+#        by (submission_time, submission_id) so that the highest submission_id
+#        wins on equal times)
+#        or, if all the submissions of the pair are invalid, 0 (rule D).
+#     2. Compute the grade average per test_id.
+#   No window function, sort or union is needed.
+def query4(con):
+    return con.sql(f"""
+        WITH last_grades AS
+        (
+            SELECT test_id
+                , COALESCE(arg_max(grade, (submission_time, submission_id)) FILTER (WHERE grade > 0), 0) AS grade
+            FROM data
+            GROUP BY student_id, test_id
+        )
+        SELECT test_id
+            , MEAN(grade) AS avg_grade
+        FROM last_grades
+        GROUP BY test_id
+        ORDER BY test_id
+    """)
+
+def run(source_dir, days, top_k):
+    con = connect(source_dir)
+    check_rows(has_rows(con))
+    submission_start = window_start(con, days)
+    with profiling.stage('query 1'):
+        result1 = count_every_day(con, submission_start, days, 'TRUE')
+    with profiling.stage('query 2'):
+        result2 = count_every_day(con, submission_start, days, 'grade > 0')
+    with profiling.stage('query 3') as stage:
+        result3 = query3(con, submission_start, top_k).fetchall()
+        stage.rows_out = len(result3)
+    with profiling.stage('query 4') as stage:
+        result4 = query4(con).fetchall()
+        stage.rows_out = len(result4)
+    con.close()
+    return Results(result1, result2, result3, result4)
@@ -0,0 +1,27 @@
+import os
+
+from challenge import cache, profiling
+from challenge.backends import use_solution
+from challenge.backends.python import answer
+
+use_solution('python', 'numpy_engine.py')
+from numpy_engine import SubmissionArrays
+
+# --------------------------------------------------------------
+# NumPy backend: the vectorized engine of the Python solution (see
+# python/numpy_engine.py)
+# --------------------------------------------------------------
+
+
+def run(source_dir, days, top_k):
+    with profiling.stage('load arrays') as stage:
+        grades = cache.load_arrays(source_dir, 'grades')
+        submissions = cache.load_arrays(source_dir, 'submissions')
+        if grades and submissions:
+            aggregates = SubmissionArrays.from_columns(days, grades, submissions)
+        else:
+            aggregates = SubmissionArrays.from_csv(days,
+                                                   os.path.join(source_dir, 'grades.csv'),
+                                                   os.path.join(source_dir, 'submissions.csv'))
+        stage.rows_out = aggregates.rows
+    return answer(aggregates, top_k)
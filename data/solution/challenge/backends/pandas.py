@@ -0,0 +1,152 @@
+import os
+
+import pandas as pd
+
+from challenge import cache, profiling
+from challenge.report import Results, check_rows
+
+# --------------------------------------------------------------
+# pandas backend: the in-memory DataFrames of the pandas solution
+# --------------------------------------------------------------
+# The tables are loaded with the used columns only and explicit (compact)
+# data types; the names of students and tests are never used, so only
+# their ids are loaded. Students and tests are semi-joined on their id
+# sets to filter out the submissions of unknown students or tests, while
+# grades are merged to append the grade column.
+# --------------------------------------------------------------
+
+STUDENT_OPTIONS = dict(usecols=['student_id'], dtype={'student_id': 'int32'})
+TEST_OPTIONS = dict(usecols=['test_id'], dtype={'test_id': 'int32'})
+SUBMISSION_OPTIONS = dict(usecols=['submission_id', 'test_id', 'student_id', 'submission_time'],
+                          dtype={'submission_id': 'int32', 'test_id': 'int32', 'student_id': 'int32'},
+                          parse_dates=['submission_time'],
+                          date_format='%Y-%m-%d %H:%M:%S')
+GRADE_OPTIONS = dict(usecols=['submission_id', 'grade'], dtype={'submission_id': 'int32', 'grade': 'int8'})
+
+
+# Reads a table from the columnar cache if it is fresh (see challenge/cache.py),
+# otherwise from its CSV file
+def read_table(source_dir, name, **csv_options):
+    path = cache.parquet_path(source_dir, name)
+    if path:
+        return pd.read_parquet(path)
+    return pd.read_csv(os.path.join(source_dir, f'{name}.csv'), **csv_options)
+
+# Reads a table in chunks of rows from the columnar cache if it is fresh,
+# otherwise from its CSV file
+def read_chunks(source_dir, name, chunksize, **csv_options):
+    path = cache.parquet_path(source_dir, name)
+    if path:
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(os.path.join(source_dir, f'{name}.csv'), chunksize=chunksize, **csv_options)
+
+# Returns the joined submissions with their grade and submission_date
+# (datetime64 truncated to the day), sorted by submission_time
+def load(source_dir):
+    with profiling.stage('load students') as stage:
+        students = read_table(source_dir, 'students', **STUDENT_OPTIONS)
+        stage.rows_out = len(students)
+    with profiling.stage('load tests') as stage:
+        tests = read_table(source_dir, 'tests', **TEST_OPTIONS)
+        stage.rows_out = len(tests)
+    with profiling.stage('load submissions') as stage:
+        submissions = read_table(source_dir, 'submissions', **SUBMISSION_OPTIONS)
+        stage.rows_out = len(submissions)
+    with profiling.stage('load grades') as stage:
+        grades = read_table(source_dir, 'grades', **GRADE_OPTIONS)
+        stage.rows_out = len(grades)
+
+    with profiling.stage('join') as stage:
+        df = submissions[submissions['student_id'].isin(students['student_id']) &
+                         submissions['test_id'].isin(tests['test_id'])] \
+            .merge(grades, on='submission_id')
+        stage.rows_in, stage.rows_out = len(submissions), len(df)
+
+    with profiling.stage('cast date') as stage:
+        df['submission_date'] = df['submission_time'].dt.normalize()
+        stage.rows_in = stage.rows_out = len(df)
+
+    with profiling.stage('sort') as stage:
+        df = df.sort_values(by='submission_time')
+        stage.rows_in = stage.rows_out = len(df)
+    return df
+
+# Extracts the last days of data
+def extract_consecutive_days(df, days):
+    return df[(df['submission_date'] > (df['submission_date'].max() - pd.Timedelta(days=days)))]
+
+# Number of students of the unique (student_id, submission_date) rows
+# that have all the days
+def filter_students(filtered, days):
+    result = filtered.groupby('student_id').nunique() == days
+    result = result.rename(columns={'submission_date': 'is_consecutive'})
+    return result[result['is_consecutive']].shape[0]
+
+# Pass unique combinations of all (student, submission) rows to the filter
+def query1(extracted, days):
+    return filter_students(extracted[['student_id', 'submission_date']].drop_duplicates(), days)
+
+# Pass unique combinations of all valid (student, submission) rows to the filter, grade > 0
+def query2(extracted, days):
+    return filter_students(extracted[extracted.grade > 0][['student_id', 'submission_date']].drop_duplicates(), days)
+
+# For each submission_date, the top_k students with the highest count of rows
+# (and the lowest student_ids in case of ties)
+def query3(extracted, top_k=1):
+    return extracted \
+        .groupby(['student_id', 'submission_date']) \
+        .size() \
+        .reset_index(name='count') \
+        .sort_values(by=['submission_date', 'count', 'student_id'],
+                     ascending=[True, False, True]) \
+        .groupby('submission_date') \
+        .head(top_k)[['submission_date', 'student_id', 'count']] \
+        .reset_index(drop=True)
+
+# Select the relevant submission of each (student_id, test_id) combination
+# with vectorized operations only (see rules B-D in challenge/report.py):
+#   1. Sort the submissions by (is_valid, submission_time, submission_id), so
+#      that the valid submissions of each combination come after the invalid
+#      ones, and equal times are ordered by submission_id.
+#   2. Keep the last row of each combination, which is the last valid
+#      submission (C, the highest submission_id on equal times), or the last
+#      one if all submissions are invalid (B, D).
+# The chunked mode selects the same rows (see pandas/chunked.py).
+def query4(df):
+    return df \
+        .assign(is_valid=df['grade'] > 0) \
+        .sort_values(by=['is_valid', 'submission_time', 'submission_id'], kind='stable') \
+        .drop_duplicates(subset=['student_id', 'test_id'], keep='last') \
+        .groupby('test_id')['grade'] \
+        .mean() \
+        .reset_index() \
+        .rename(columns={'grade': 'avg_grade'})
+
+# Converts the result frames of Queries 3 and 4 into Python rows
+def query3_rows(frame):
+    return [(day.date(), int(student_id), int(count))
+            for day, student_id, count in frame[['submission_date', 'student_id', 'count']].itertuples(index=False)]
+
+def query4_rows(frame):
+    return [(int(test_id), float(avg_grade)) for test_id, avg_grade in frame.itertuples(index=False)]
+
+def run(source_dir, days, top_k):
+    df = load(source_dir)
+    check_rows(df.shape[0])
+    with profiling.stage('query 1') as stage:
+        extracted = extract_consecutive_days(df, days)
+        result1 = query1(extracted, days)
+        stage.rows_in = len(df)
+    with profiling.stage('query 2') as stage:
+        result2 = query2(extracted, days)
+        stage.rows_in = len(extracted)
+    with profiling.stage('query 3') as stage:
+        result3 = query3_rows(query3(extracted, top_k))
+        stage.rows_in, stage.rows_out = len(extracted), len(result3)
+    with profiling.stage('query 4') as stage:
+        result4 = query4_rows(query4(df))
+        stage.rows_in, stage.rows_out = len(df), len(result4)
+    return Results(int(result1), int(result2), result3, result4)
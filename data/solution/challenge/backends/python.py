@@ -0,0 +1,40 @@
+from datetime import date
+
+from challenge import profiling
+from challenge.backends import use_solution
+from challenge.report import Results, check_rows
+
+use_solution('python', 'engine.py')
+from engine import Aggregates
+from sources import load_grades, load_submissions
+
+# --------------------------------------------------------------
+# Python backend: the streaming engine of the Python solution (see
+# python/engine.py), without any dependency (NumPy is only used if
+# installed, see python/sources.py)
+# --------------------------------------------------------------
+
+
+# Answers the queries of the aggregates of the Python engines, whose
+# dates are day ordinals
+def answer(aggregates, top_k):
+    check_rows(aggregates.rows)
+    with profiling.stage('query 1'):
+        result1 = aggregates.query1()
+    with profiling.stage('query 2'):
+        result2 = aggregates.query2()
+    with profiling.stage('query 3') as stage:
+        result3 = [(date.fromordinal(day), student_id, count) for day, student_id, count in aggregates.query3(top_k)]
+        stage.rows_out = len(result3)
+    with profiling.stage('query 4') as stage:
+        result4 = aggregates.query4()
+        stage.rows_out = len(result4)
+    return Results(result1, result2, result3, result4)
+
+def run(source_dir, days, top_k):
+    with profiling.stage('load grades'):
+        grades = load_grades(source_dir)
+    with profiling.stage('aggregate submissions') as stage:
+        aggregates = Aggregates(days).consume(load_submissions(source_dir), grades)
+        stage.rows_in = aggregates.rows
+    return answer(aggregates, top_k)
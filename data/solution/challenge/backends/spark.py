@@ -0,0 +1,248 @@
+import json
+import os
+from datetime import date, timedelta
+
+import pyspark.sql.functions as F
+from pyspark import StorageLevel
+from pyspark.sql import SparkSession
+from pyspark.sql.functions import col
+from pyspark.sql.types import ByteType, IntegerType, StringType, StructField, StructType, TimestampType
+from pyspark.sql.window import Window
+
+from challenge import cache, profiling
+from challenge.report import Results, check_rows
+
+# ----------------------------------------------------------------------------------
+#  Spark backend: the single-scan jobs of the pyspark solution
+#
+#  The join is computed once and persisted. It is then read twice only: by the
+#  daily aggregation per (student_id, submission_date), which feeds the validation,
+#  the max date and Queries 1-3, and by the window of Query 4.
+#
+#  The CSV files are read with explicit schemas (the types of challenge/cache.py),
+#  so they are scanned once instead of once more to infer the schema.
+#
+#  Layout mode: the join is ingested once into a Parquet table (see ingest())
+#
+#    partitioned by submission_date   -> Queries 1-3 only read the partitions of
+#                                        the window, and the max date and the
+#                                        validation come from the partition list
+#    bucketed by student_id           -> the daily aggregation, the days per
+#                                        student (Queries 1-2) and the window per
+#                                        (student_id, test_id) of Query 4 are
+#                                        clustered by student_id, so they reuse the
+#                                        buckets instead of an Exchange of all rows
+#    sorted by student_id, test_id,   -> the order of the window of Query 4
+#    submission_time                     within each file
+#
+#  Bucketing by (student_id, test_id) would only serve Query 4: a hash of both
+#  columns does not cluster the rows by student_id alone. What is left to exchange
+#  is small: the daily counts of the window by date (Query 3) and the partial
+#  aggregates of the results. The table is ingested again only when the size or
+#  mtime of a CSV file changed (see LAYOUT_SOURCES).
+# ----------------------------------------------------------------------------------
+
+# Schemas of the CSV files
+SCHEMAS = {
+    'students': StructType([StructField('student_id', IntegerType()),
+                            StructField('student_name', StringType())]),
+    'tests': StructType([StructField('test_id', IntegerType()),
+                         StructField('test_name', StringType())]),
+    'submissions': StructType([StructField('submission_id', IntegerType()),
+                               StructField('test_id', IntegerType()),
+                               StructField('student_id', IntegerType()),
+                               StructField('submission_time', TimestampType())]),
+    'grades': StructType([StructField('submission_id', IntegerType()),
+                          StructField('grade', ByteType())]),
+}
+
+# Bucketed and partitioned table of the layout mode, stored in LAYOUT_DIR next
+# to the CSV files with the fingerprint of its sources
+LAYOUT_TABLE = 'submissions_layout'
+LAYOUT_DIR = 'spark_layout'
+LAYOUT_SOURCES = 'sources.json'
+LAYOUT_COLUMNS = [('student_id', 'INT'), ('test_id', 'INT'), ('submission_id', 'INT'),
+                  ('submission_time', 'TIMESTAMP'), ('grade', 'TINYINT'), ('submission_date', 'DATE')]
+BUCKETS = 8
+
+
+# The cached submission times are timezone naive, keep them as they are
+def session():
+    return SparkSession.builder \
+        .appName('TestChallenge#1App') \
+        .config('spark.sql.session.timeZone', 'UTC') \
+        .getOrCreate()
+
+# Reads a table from the columnar cache if it is fresh (see challenge/cache.py),
+# otherwise from its CSV file
+def read_table(spark, source_dir, name):
+    path = cache.parquet_path(source_dir, name)
+    if path:
+        return spark.read.parquet(path)
+    return spark.read.csv(os.path.join(source_dir, f'{name}.csv'), header=True, schema=SCHEMAS[name],
+                          timestampFormat='yyyy-MM-dd HH:mm:ss')
+
+# Joins all tables and casts submission_time into submission_date
+def load(spark, source_dir):
+    df = read_table(spark, source_dir, 'students') \
+        .join(read_table(spark, source_dir, 'submissions'), on='student_id') \
+        .join(read_table(spark, source_dir, 'tests'), on='test_id') \
+        .join(read_table(spark, source_dir, 'grades'), on='submission_id')
+    return df.withColumn('submission_date', F.to_date('submission_time'))
+
+# Number of Exchange nodes (shuffles and broadcasts) of the physical plan of
+# a DataFrame; the exchanges reused within the plan are not counted
+def count_exchanges(frame):
+    plan = frame._jdf.queryExecution().executedPlan().toString()
+    return sum(1 for line in plan.splitlines() if 'Exchange' in line and 'ReusedExchange' not in line)
+
+# Collects a DataFrame, first counting the Exchange nodes of its plan into the
+# exchanges dict (if given) under the name of the query
+def collect(frame, name, exchanges):
+    if exchanges is not None:
+        exchanges[name] = count_exchanges(frame)
+    return frame.collect()
+
+# Count all and valid submissions per (student, submission_date)
+def daily_counts(df):
+    return df \
+        .groupby('student_id', 'submission_date') \
+        .agg(F.count('*').alias('count'),
+             F.sum(F.when(col('grade') > 0, 1).otherwise(0)).alias('valid_count'))
+
+# Query 1 & 2: count the (valid) days of each student and the students with
+# all days in one job
+def query12(window, days):
+    return window \
+        .groupby('student_id') \
+        .agg(F.count('*').alias('days'),
+             F.sum(F.when(col('valid_count') > 0, 1).otherwise(0)).alias('valid_days')) \
+        .agg(F.sum(F.when(col('days') == days, 1).otherwise(0)).alias('result1'),
+             F.sum(F.when(col('valid_days') == days, 1).otherwise(0)).alias('result2'))
+
+# Query 3: the top_k students of each date by count (lowest student_id on ties)
+def query3(window, top_k):
+    return window \
+        .withColumn('sort', F.row_number().over(Window.partitionBy('submission_date')
+                                                      .orderBy(F.desc('count'), 'student_id'))) \
+        .where(col('sort') <= top_k) \
+        .sort('submission_date', 'sort') \
+        .select('submission_date', 'student_id', 'count')
+
+# Query 4: one window per (student, test) ordered by validity, time and
+# submission_id, all descending: the first row is the last valid submission
+# (the highest submission_id on equal times) or, if all the submissions are
+# invalid, the last one (grade 0, rule D)
+def query4(df):
+    return df \
+        .select('student_id', 'test_id', 'submission_time', 'submission_id', 'grade') \
+        .withColumn('sort', F.row_number().over(Window.partitionBy('student_id', 'test_id')
+                                                      .orderBy((col('grade') > 0).desc(),
+                                                               F.desc('submission_time'),
+                                                               F.desc('submission_id')))) \
+        .where(col('sort') == 1) \
+        .groupby('test_id') \
+        .agg(F.mean('grade').alias('avg_grade')) \
+        .sort('test_id')
+
+# Answers the queries from the daily counts of the window and the joined rows
+def answer(window, df, days, top_k, exchanges):
+    with profiling.stage('query 1 & 2'):
+        results = collect(query12(window, days), 'query 1 & 2', exchanges)[0]
+
+    with profiling.stage('query 3') as stage:
+        result3 = collect(query3(window, top_k), 'query 3', exchanges)
+        stage.rows_out = len(result3)
+
+    with profiling.stage('query 4') as stage:
+        result4 = collect(query4(df), 'query 4', exchanges)
+        stage.rows_out = len(result4)
+
+    return Results(results.result1 or 0,
+                   results.result2 or 0,
+                   [(row.submission_date, row.student_id, row['count']) for row in result3],
+                   [(row.test_id, row.avg_grade) for row in result4])
+
+def single_scan(df, days, top_k=1, exchanges=None):
+    df = df.persist(StorageLevel.MEMORY_AND_DISK)
+    daily = daily_counts(df).persist(StorageLevel.MEMORY_AND_DISK)
+
+    # Validate and calculate min/max dates in one job (which also computes
+    # and persists the join and the daily aggregation)
+    with profiling.stage('join & daily aggregation') as stage:
+        summary = collect(daily.agg(F.sum('count').alias('rows'), F.max('submission_date').alias('max_date')),
+                          'join & daily aggregation', exchanges)[0]
+        stage.rows_in = summary.rows
+    check_rows(summary.rows)
+    min_date = summary.max_date - timedelta(days=days-1)
+    return answer(daily.where(col('submission_date') >= F.lit(min_date)), df, days, top_k, exchanges)
+
+# Fingerprint of the sources of the layout: the size and mtime of every CSV
+# file, and the number of buckets
+def layout_fingerprint(source_dir, buckets):
+    return {'sources': {name: [os.stat(path).st_size, os.stat(path).st_mtime_ns]
+                        for name in ['students', 'tests', 'submissions', 'grades']
+                        for path in [os.path.join(source_dir, f'{name}.csv')]},
+            'buckets': buckets}
+
+# Returns the layout table of source_dir, ingesting the join into it unless it
+# was already ingested from the same CSV files. The table of an earlier run is
+# registered again in the catalog of the session, with its partitions.
+def ingest(spark, source_dir, buckets=BUCKETS):
+    layout_dir = os.path.join(source_dir, LAYOUT_DIR)
+    sources_path = os.path.join(layout_dir, LAYOUT_SOURCES)
+    table_path = os.path.abspath(os.path.join(layout_dir, LAYOUT_TABLE))
+    fingerprint = layout_fingerprint(source_dir, buckets)
+    try:
+        with open(sources_path) as f:
+            ingested = json.load(f)
+    except (OSError, ValueError):
+        ingested = None
+
+    if ingested != fingerprint:
+        with profiling.stage('ingest layout'):
+            load(spark, source_dir) \
+                .select([col(name).cast(sql_type).alias(name) for name, sql_type in LAYOUT_COLUMNS]) \
+                .repartition(buckets, 'student_id') \
+                .write \
+                .format('parquet') \
+                .partitionBy('submission_date') \
+                .bucketBy(buckets, 'student_id') \
+                .sortBy('student_id', 'test_id', 'submission_time') \
+                .option('path', table_path) \
+                .mode('overwrite') \
+                .saveAsTable(LAYOUT_TABLE)
+        with open(sources_path, 'w') as f:
+            json.dump(fingerprint, f)
+    elif LAYOUT_TABLE not in [table.name for table in spark.catalog.listTables()]:
+        columns = ', '.join(f'{name} {sql_type}' for name, sql_type in LAYOUT_COLUMNS)
+        spark.sql(f"""
+            CREATE TABLE {LAYOUT_TABLE} ({columns})
+            USING parquet
+            PARTITIONED BY (submission_date)
+            CLUSTERED BY (student_id) SORTED BY (student_id, test_id, submission_time) INTO {buckets} BUCKETS
+            LOCATION '{table_path}'
+        """)
+        spark.sql(f'ALTER TABLE {LAYOUT_TABLE} RECOVER PARTITIONS')
+    return spark.table(LAYOUT_TABLE)
+
+# Answers the queries from the layout table: the dates of data are the
+# partitions of the table, so neither the validation nor the max date read
+# any row, and Queries 1-3 read the partitions of the window only
+def layout_scan(spark, table, days, top_k=1, exchanges=None):
+    with profiling.stage('partitions') as stage:
+        values = [row.partition.split('=', 1)[1] for row in spark.sql(f'SHOW PARTITIONS {LAYOUT_TABLE}').collect()]
+        # Rows without a submission time are in the default partition
+        dates = [date.fromisoformat(value) for value in values if value != '__HIVE_DEFAULT_PARTITION__']
+        stage.rows_out = len(dates)
+    check_rows(len(dates))
+    min_date = max(dates) - timedelta(days=days-1)
+    window = daily_counts(table.where(col('submission_date') >= F.lit(min_date)))
+    return answer(window, table, days, top_k, exchanges)
+
+def run(source_dir, days, top_k):
+    spark = session()
+    try:
+        return single_scan(load(spark, source_dir), days, top_k)
+    finally:
+        spark.stop()
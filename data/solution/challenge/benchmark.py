@@ -0,0 +1,195 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+# --------------------------------------------------------------
+# Cross-engine benchmark
+# --------------------------------------------------------------
+# Generates synthetic datasets of the given sizes (see generate.py),
+# runs the test.py of each solution in a child process with the
+# dataset as working directory and prints a comparison table of the
+# wall time, peak RSS and throughput of every run.
+#
+# All solutions print the report of challenge/report.py, which is
+# parsed into the answers of the four queries. They are checked
+# against the first engine that succeeded:
+#
+#   - Queries 1 to 3 must be identical.
+#   - The averages of Query 4 may differ by the rounding of the
+#     output (2 decimals) only: the engines add the grades in
+#     different orders.
+#
+# The generated datasets have same-second resubmissions (--tie-rate),
+# so the tie rule of Query 4 is compared as well.
+#
+# Every run is cold: the DuckDB database of the sql solution is
+# removed beforehand. With --cache, the columnar cache (see cache.py)
+# is built before the runs. The peak RSS is that of the process tree
+# as reported by wait4 (for pyspark it includes the JVM). Linux keeps
+# the peak RSS of a process across fork and exec, so the datasets and
+# caches are built in child processes as well and the benchmark itself
+# stays small (it only adds the ~10 MB of a bare interpreter).
+#
+# Usage: python -m challenge.benchmark [--sizes N [N ...]] [--engines E [E ...]] [options]
+# --------------------------------------------------------------
+
+SOLUTION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Command line of each engine relative to the solution directory
+ENGINES = {
+    'python': ['python/test.py'],
+    'python-numpy': ['python/test.py', '--engine', 'numpy'],
+    'pandas': ['pandas/test.py'],
+    'sql': ['sql/test.py'],
+    'pyspark': ['pyspark/test.py'],
+}
+
+# Tolerance of the Query 4 averages (rounding of the output)
+AVERAGE_TOLERANCE = 0.0051
+
+
+# Parses the report of a solution into the answers of the four queries:
+# (count, count, [(date, student_id, submission_count)], {test_id: average})
+def parse_results(output):
+    sections = re.split(r'Result #\d:?', output)[1:]
+    if len(sections) != 4:
+        raise ValueError(f'expected 4 results, found {len(sections)}')
+    query1 = int(sections[0].split()[0])
+    query2 = int(sections[1].split()[0])
+    query3 = [(date, int(student_id), int(count)) for date, student_id, count
+              in re.findall(r'^(\d{4}-\d{2}-\d{2})\s*\|\s*(\d+)\s*\|\s*(\d+)', sections[2], re.M)]
+    query4 = {int(test_id): float(average) for test_id, average
+              in re.findall(r'^\s*(\d+)\s*\|\s*(\d+\.\d+)', sections[3], re.M)}
+    return query1, query2, query3, query4
+
+# Returns the first difference between the answers of two runs, or None
+def compare_results(expected, actual):
+    for query in range(3):
+        if expected[query] != actual[query]:
+            return f'Query {query + 1} differs'
+    expected_averages, averages = expected[3], actual[3]
+    if expected_averages.keys() != averages.keys():
+        return 'Query 4 differs (tests)'
+    for test_id in expected_averages:
+        if abs(expected_averages[test_id] - averages[test_id]) > AVERAGE_TOLERANCE:
+            return f'Query 4 differs (test {test_id})'
+    return None
+
+# Runs a solution in the given directory and returns its
+# (exit status, wall seconds, peak RSS bytes, output)
+def run_solution(command, data_dir):
+    with tempfile.TemporaryFile(mode='w+') as output:
+        started = time.perf_counter()
+        process = subprocess.Popen([sys.executable] + command, cwd=data_dir,
+                                   stdout=output, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(process.pid, 0)
+        seconds = time.perf_counter() - started
+        process.returncode = os.waitstatus_to_exitcode(status)
+        output.seek(0)
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        peak = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+        return process.returncode, seconds, peak, output.read()
+
+# Generates the dataset of a size unless it exists with the same parameters
+def prepare_dataset(work_dir, submissions, options, cache):
+    data_dir = os.path.join(work_dir, str(submissions))
+    params_path = os.path.join(data_dir, 'params.json')
+    params = dict(options, submissions=submissions)
+    try:
+        with open(params_path) as f:
+            fresh = json.load(f) == params
+    except (OSError, ValueError):
+        fresh = False
+    if not fresh:
+        command = ['-m', 'challenge.generate', data_dir]
+        for name, value in params.items():
+            command += ['--' + name.replace('_', '-'), str(value)]
+        subprocess.run([sys.executable] + command, cwd=SOLUTION_DIR, check=True)
+        with open(params_path, 'w') as f:
+            json.dump(params, f)
+    if cache:
+        subprocess.run([sys.executable, '-m', 'challenge.cache', data_dir],
+                       cwd=SOLUTION_DIR, check=True, stdout=subprocess.DEVNULL)
+    return data_dir
+
+def benchmark(sizes, engines, work_dir, options, cache=False):
+    results = []
+    for submissions in sizes:
+        data_dir = prepare_dataset(work_dir, submissions, options, cache)
+        expected = None
+        for engine in engines:
+            database = os.path.join(data_dir, 'challenge.duckdb')
+            if os.path.exists(database):
+                os.remove(database)
+            status, seconds, peak, output = run_solution([os.path.join(SOLUTION_DIR, part) if part.endswith('.py') else part
+                                                          for part in ENGINES[engine]], data_dir)
+            result = {'engine': engine, 'submissions': submissions, 'seconds': seconds,
+                      'peak_rss': peak, 'rows_per_second': submissions / seconds}
+            if status != 0:
+                result['check'] = f'failed ({status})'
+                result['error'] = output.strip().splitlines()[-1:]
+                result['seconds'] = result['peak_rss'] = result['rows_per_second'] = None
+            else:
+                try:
+                    answers = parse_results(output)
+                except ValueError as e:
+                    result['check'] = f'unparsable ({e})'
+                else:
+                    if expected is None:
+                        expected = answers
+                        result['check'] = 'reference'
+                    else:
+                        result['check'] = compare_results(expected, answers) or 'identical'
+            results.append(result)
+    return results
+
+def print_table(results):
+    print('--------------------------------------------------------------------------------------')
+    print('submissions |       engine |   seconds | peak RSS MB |     rows/sec | check')
+    print('--------------------------------------------------------------------------------------')
+    for result in results:
+        failed = result['seconds'] is None
+        print("{} | {} | {} | {} | {} | {}".format(str(result['submissions']).rjust(11),
+                                                   result['engine'].rjust(12),
+                                                   ('-' if failed else f"{result['seconds']:.2f}").rjust(9),
+                                                   ('-' if failed else f"{result['peak_rss'] / 2**20:.1f}").rjust(11),
+                                                   ('-' if failed else f"{result['rows_per_second']:,.0f}").rjust(12),
+                                                   result['check']))
+        if failed and result['error']:
+            print(f"{''.rjust(11)} | {result['error'][0]}")
+    print('--------------------------------------------------------------------------------------')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python -m challenge.benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help='numbers of submissions of the datasets')
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES))
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'challenge-benchmark'),
+                        help='directory of the generated datasets (kept between runs)')
+    parser.add_argument('--cache', action='store_true', help='build the columnar cache before the runs')
+    parser.add_argument('--json', help='also write the results as JSON to this file')
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--tests', type=int, default=100)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--resubmission-rate', type=float, default=0.2)
+    parser.add_argument('--tie-rate', type=float, default=0.05)
+    parser.add_argument('--invalid-rate', type=float, default=0.2)
+    parser.add_argument('--skew', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    options = {'students': args.students, 'tests': args.tests, 'days': args.days,
+               'resubmission_rate': args.resubmission_rate, 'tie_rate': args.tie_rate,
+               'invalid_rate': args.invalid_rate,
+               'skew': args.skew, 'seed': args.seed}
+    results = benchmark(args.sizes, args.engines, args.work_dir, options, args.cache)
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,152 @@
+import argparse
+import hashlib
+import json
+import os
+
+# --------------------------------------------------------------
+# Columnar binary cache of the CSV inputs
+# --------------------------------------------------------------
+# The four CSV files are converted once into typed columnar files
+# stored in a .cache directory next to them:
+#
+#   <table>.parquet       -> read by the pandas, pyspark and sql solutions
+#   <table>.<column>.npy  -> memory-mapped by the python solution
+#
+# Each table is keyed by the size, mtime and SHA-256 hash of its CSV
+# file (see manifest.json). A table is fresh as long as the size and
+# mtime of the CSV file did not change; if only the mtime changed,
+# the hash decides and a matching hash records the new mtime, so the
+# file is not hashed again on the next runs. The solutions read a table
+# from the cache when it is fresh and fall back to the CSV file
+# otherwise.
+#
+# The names of students and tests are never used by the queries, so
+# only their ids are cached.
+#
+# Usage: python -m challenge.cache [DIR] (builds the cache of DIR)
+# --------------------------------------------------------------
+
+CACHE_DIR = '.cache'
+MANIFEST = 'manifest.json'
+
+# Cached columns of each table with their numpy data type
+TABLES = {
+    'students': [('student_id', 'int32')],
+    'tests': [('test_id', 'int32')],
+    'submissions': [('submission_id', 'int32'),
+                    ('test_id', 'int32'),
+                    ('student_id', 'int32'),
+                    ('submission_time', 'datetime64[s]')],
+    'grades': [('submission_id', 'int32'),
+               ('grade', 'int8')],
+}
+
+
+def _hash(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def _read_manifest(source_dir):
+    try:
+        with open(os.path.join(source_dir, CACHE_DIR, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+# Replaces the manifest atomically (the temporary file is per process,
+# as several solutions may read the cache at the same time)
+def _write_manifest(source_dir, manifest):
+    path = os.path.join(source_dir, CACHE_DIR, MANIFEST)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_path, path)
+
+def _csv_path(source_dir, table):
+    return os.path.join(source_dir, f'{table}.csv')
+
+# Returns True if the cached table matches its CSV file. If only its mtime
+# changed and the hash matches, the new mtime is recorded: in the given
+# manifest (build() writes it), or else in the manifest file, unless the
+# entry was changed meanwhile or the cache is read-only
+def is_fresh(source_dir, table, manifest=None):
+    key = (manifest if manifest is not None else _read_manifest(source_dir)).get(table)
+    if key is None:
+        return False
+    stat = os.stat(_csv_path(source_dir, table))
+    if stat.st_size != key['size']:
+        return False
+    if stat.st_mtime_ns == key['mtime_ns']:
+        return True
+    if _hash(_csv_path(source_dir, table)) != key['sha256']:
+        return False
+    if manifest is not None:
+        key['mtime_ns'] = stat.st_mtime_ns
+        return True
+    current = _read_manifest(source_dir)
+    if current.get(table) == key:
+        current[table] = dict(key, mtime_ns=stat.st_mtime_ns)
+        try:
+            _write_manifest(source_dir, current)
+        except OSError:
+            pass
+    return True
+
+# Returns the path of the cached Parquet file of a table, or None if it is not fresh
+def parquet_path(source_dir, table):
+    if not is_fresh(source_dir, table):
+        return None
+    return os.path.join(source_dir, CACHE_DIR, f'{table}.parquet')
+
+# Returns the cached columns of a table as read-only memory-mapped numpy arrays,
+# or None if the table is not fresh or numpy is not available
+def load_arrays(source_dir, table):
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+    if not is_fresh(source_dir, table):
+        return None
+    return {column: np.load(os.path.join(source_dir, CACHE_DIR, f'{table}.{column}.npy'), mmap_mode='r')
+            for column, _ in TABLES[table]}
+
+# Converts the CSV files whose cached tables are missing or stale,
+# returns the list of converted tables
+def build(source_dir='.', force=False):
+    import pyarrow as pa
+    import pyarrow.csv as pc
+    import pyarrow.parquet as pq
+    import numpy as np
+
+    cache_dir = os.path.join(source_dir, CACHE_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = _read_manifest(source_dir)
+    built = []
+    for table, columns in TABLES.items():
+        path = _csv_path(source_dir, table)
+        if not force and is_fresh(source_dir, table, manifest):
+            continue
+        stat = os.stat(path)
+        data = pc.read_csv(path, convert_options=pc.ConvertOptions(
+            include_columns=[column for column, _ in columns],
+            column_types={column: pa.from_numpy_dtype(np.dtype(dtype)) for column, dtype in columns}))
+        pq.write_table(data, os.path.join(cache_dir, f'{table}.parquet'))
+        for column, _ in columns:
+            np.save(os.path.join(cache_dir, f'{table}.{column}.npy'), data.column(column).to_numpy())
+        manifest[table] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': _hash(path)}
+        built.append(table)
+
+    _write_manifest(source_dir, manifest)
+    return built
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python -m challenge.cache')
+    parser.add_argument('source_dir', nargs='?', default='.', help='directory of the CSV files')
+    parser.add_argument('--force', action='store_true', help='rebuild all tables even if they are fresh')
+    args = parser.parse_args()
+    built = build(args.source_dir, args.force)
+    print(f'Cached tables: {", ".join(built) if built else "none (all fresh)"}')
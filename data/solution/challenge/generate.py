@@ -0,0 +1,117 @@
+import argparse
+import os
+
+# --------------------------------------------------------------
+# Synthetic data generator
+# --------------------------------------------------------------
+# Writes students.csv, tests.csv, submissions.csv and grades.csv with
+# the schema of data/README.md:
+#
+#   - The submission times are spread uniformly over the last `days`
+#     days up to `end` (the last day always has submissions).
+#   - The activity of the students is skewed: the student of rank r
+#     submits with a probability proportional to 1 / r^skew (skew 0
+#     means that all students are equally active).
+#   - A share of the submissions (resubmission_rate) resubmits a test
+#     the same student submitted before, at a later time or, for a
+#     share of the resubmissions (tie_rate), at the same second. Those
+#     are decided by the tie rule of Query 4 (the highest submission_id,
+#     see report.py), so the engines are compared on it as well.
+#   - A share of the grades (invalid_rate) is 0, the other grades
+#     range from 1 to 100. A share of the submissions (ungraded_rate)
+#     gets no grade at all; since the pandas, pyspark and sql solutions
+#     inner join the grades, it is 0 by default.
+#
+# The rows are generated with NumPy in chunks, so the size of the
+# dataset is not limited by memory.
+#
+# Usage: python -m challenge.generate DIR --submissions N [options]
+# --------------------------------------------------------------
+
+CHUNK_SIZE = 1_000_000
+
+
+def _write_csv(path, header, lines):
+    with open(path, 'w') as f:
+        f.write(header + '\n')
+        for chunk in lines:
+            f.write(chunk)
+
+def _chunk_lines(*columns):
+    return ''.join(','.join(values) + '\n' for values in zip(*columns))
+
+def generate(out_dir, submissions, students=1000, tests=100, days=365, end='2023-12-31',
+             resubmission_rate=0.2, invalid_rate=0.2, ungraded_rate=0.0, skew=1.0, seed=0, tie_rate=0.05):
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+
+    _write_csv(os.path.join(out_dir, 'students.csv'), '"student_id","student_name"',
+               (f'{i},"Student {i}"\n' for i in range(1, students + 1)))
+    _write_csv(os.path.join(out_dir, 'tests.csv'), '"test_id","test_name"',
+               (f'{i},"Test {i}"\n' for i in range(1, tests + 1)))
+
+    # Activity of the students by rank; the ranks are shuffled over the ids
+    weights = 1.0 / np.arange(1, students + 1) ** skew
+    weights /= weights.sum()
+    student_ids = rng.permutation(students) + 1
+    first_second = (np.datetime64(end, 'D') - days + 1).astype('datetime64[s]').astype(np.int64)
+    span = days * 86400
+
+    def chunks():
+        for start in range(0, submissions, CHUNK_SIZE):
+            rows = min(CHUNK_SIZE, submissions - start)
+            student = student_ids[rng.choice(students, rows, p=weights)]
+            test = rng.integers(1, tests + 1, rows)
+            time = first_second + rng.integers(0, span, rows)
+            if start == 0:
+                time[0] = first_second + span - 1  # the last day has submissions
+
+            # Resubmissions copy the (student, test) of an earlier row of the chunk
+            # and come later (within a week) or, for tie_rate of them, at the same
+            # second as the earlier row
+            resubmitted = np.flatnonzero(rng.random(rows) < resubmission_rate)
+            resubmitted = resubmitted[resubmitted > 0]
+            earlier = (rng.random(len(resubmitted)) * resubmitted).astype(np.int64)
+            remaining = np.minimum(first_second + span - 1 - time[earlier], 7 * 86400)
+            keep = remaining > 0
+            resubmitted, earlier, remaining = resubmitted[keep], earlier[keep], remaining[keep]
+            student[resubmitted] = student[earlier]
+            test[resubmitted] = test[earlier]
+            later = 1 + (rng.random(len(resubmitted)) * remaining).astype(np.int64)
+            time[resubmitted] = time[earlier] + np.where(rng.random(len(resubmitted)) < tie_rate, 0, later)
+
+            grade = np.where(rng.random(rows) < invalid_rate, 0, rng.integers(1, 101, rows))
+            graded = rng.random(rows) >= ungraded_rate
+            yield np.arange(start + 1, start + rows + 1), test, student, time, grade, graded
+
+    with open(os.path.join(out_dir, 'submissions.csv'), 'w') as submissions_file, \
+            open(os.path.join(out_dir, 'grades.csv'), 'w') as grades_file:
+        submissions_file.write('"submission_id","test_id","student_id","submission_time"\n')
+        grades_file.write('"submission_id","grade"\n')
+        for submission_id, test, student, time, grade, graded in chunks():
+            times = np.char.replace(np.datetime_as_string(time.astype('datetime64[s]')), 'T', ' ')
+            ids = submission_id.astype(str)
+            submissions_file.write(_chunk_lines(ids, test.astype(str), student.astype(str), times))
+            grades_file.write(_chunk_lines(ids[graded], grade[graded].astype(str)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python -m challenge.generate')
+    parser.add_argument('out_dir', help='directory of the generated CSV files')
+    parser.add_argument('--submissions', type=int, required=True)
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--tests', type=int, default=100)
+    parser.add_argument('--days', type=int, default=365, help='day span of the submissions')
+    parser.add_argument('--end', default='2023-12-31', help='last day of the submissions')
+    parser.add_argument('--resubmission-rate', type=float, default=0.2)
+    parser.add_argument('--tie-rate', type=float, default=0.05,
+                        help='share of the resubmissions at the same second as the earlier submission')
+    parser.add_argument('--invalid-rate', type=float, default=0.2)
+    parser.add_argument('--ungraded-rate', type=float, default=0.0)
+    parser.add_argument('--skew', type=float, default=1.0, help='Zipf exponent of the student activity')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    generate(args.out_dir, args.submissions, args.students, args.tests, args.days, args.end,
+             args.resubmission_rate, args.invalid_rate, args.ungraded_rate, args.skew, args.seed, args.tie_rate)
@@ -0,0 +1,108 @@
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from challenge.backends import BACKENDS
+
+# --------------------------------------------------------------
+# Import time of the query backends
+# --------------------------------------------------------------
+# Runs `python -X importtime -c "import <module>"` in a fresh process
+# for the core of the CLI (challenge.backends and challenge.report) and
+# for every backend module, and prints:
+#
+#   import ms   -> the cumulative import time of the modules imported
+#                  on top of a bare interpreter (python -c pass)
+#   process ms  -> the wall time of the whole process
+#   heaviest    -> the packages with the highest cumulative import time
+#
+# The minimum over --repeat runs is reported. With --json FILE, one JSON
+# line per target is appended to FILE, so the numbers can be tracked
+# over time (they are keyed by date, Python version and machine).
+#
+# Usage: python -m challenge.importtime [--backends B [B ...]] [--repeat 5] [--json FILE]
+#   (run from data/solution)
+# --------------------------------------------------------------
+
+SOLUTION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+# Runs a statement with -X importtime and returns (wall seconds, {top-level
+# module: cumulative microseconds}, {package: cumulative microseconds}), or
+# None if it fails. Nested imports are indented, and packages are the
+# top-level packages imported at any depth (e.g. numpy within pandas).
+def measure(statement):
+    started = time.perf_counter()
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                             cwd=SOLUTION_DIR, capture_output=True, text=True)
+    seconds = time.perf_counter() - started
+    if process.returncode != 0:
+        return None
+    modules, packages = {}, {}
+    for match in LINE.finditer(process.stderr):
+        name, cumulative = match.group(4), int(match.group(2))
+        if len(match.group(3)) == 1:
+            modules[name] = cumulative
+        if '.' not in name and name != 'challenge':
+            packages[name] = max(packages.get(name, 0), cumulative)
+    return seconds, modules, packages
+
+# Returns (import ms, process ms, heaviest packages) of importing a module,
+# the minimum of repeated runs, or None if it cannot be imported
+def import_time(module, repeat, baseline):
+    runs = [measure(f'import {module}') for _ in range(repeat)]
+    if None in runs:
+        return None
+    imported = [sum(us for name, us in modules.items() if name not in baseline) for _, modules, _ in runs]
+    packages = [(name, us) for name, us in runs[-1][2].items() if name not in baseline]
+    return (min(imported) / 1000,
+            min(seconds for seconds, _, _ in runs) * 1000,
+            [name for name, _ in sorted(packages, key=lambda x: -x[1])[:3]])
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m challenge.importtime')
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument('--repeat', type=int, default=5, help='runs per target (default 5)')
+    parser.add_argument('--json', metavar='FILE', help='append the results as JSON lines to FILE')
+    args = parser.parse_args()
+
+    _, baseline, _ = measure('pass')
+    targets = [('core', 'challenge.backends, challenge.report')] + \
+        [(name, BACKENDS[name]) for name in args.backends]
+    timestamp = datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+    print('------------------------------------------------------------------------')
+    print('target  | import ms | process ms | heaviest imports')
+    print('------------------------------------------------------------------------')
+    for name, module in targets:
+        result = import_time(module, args.repeat, baseline)
+        if result is None:
+            print(f'{name.ljust(7)} | {"-".rjust(9)} | {"-".rjust(10)} | not installed')
+            continue
+        import_ms, process_ms, heaviest = result
+        print("{} | {} | {} | {}".format(name.ljust(7),
+                                         f'{import_ms:.1f}'.rjust(9),
+                                         f'{process_ms:.1f}'.rjust(10),
+                                         ', '.join(heaviest)))
+        if args.json:
+            with open(args.json, 'a') as f:
+                f.write(json.dumps({'timestamp': timestamp,
+                                    'python': platform.python_version(),
+                                    'machine': platform.node(),
+                                    'target': name,
+                                    'import_ms': round(import_ms, 1),
+                                    'process_ms': round(process_ms, 1),
+                                    'heaviest': heaviest}) + '\n')
+    print('------------------------------------------------------------------------')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+import atexit
+import json
+import os
+import resource
+import sys
+import time
+
+# --------------------------------------------------------------
+# Per-stage profiling
+# --------------------------------------------------------------
+# The solutions wrap their stages (load, join, sort, queries) in
+#
+#   with profiling.stage('join') as stage:
+#       ...
+#       stage.rows_in, stage.rows_out = ..., ...
+#
+# which is a no-op unless the environment variable CHALLENGE_PROFILE
+# is set to a comma separated list of options:
+#
+#   table        -> print a table of the stages at exit (default)
+#   json         -> write one JSON line per stage at exit
+#   tracemalloc  -> also trace the Python allocations of every stage
+#                   (slows down the stages that allocate many objects)
+#
+# The report goes to stderr, or is appended to the file given by
+# CHALLENGE_PROFILE_FILE, so the results on stdout are unchanged.
+#
+# Every stage records its wall time, the CPU time of the process, the
+# change of the RSS, the growth of the peak RSS and the row counts in
+# and out set by the solution. The CPU time and memory are those of
+# the Python process: the work of a JVM (pyspark) is only seen in the
+# wall time. Lazy engines (pyspark, duckdb relations) only work when
+# their results are fetched, so their stages must include the fetch.
+# Stages must not be nested.
+# --------------------------------------------------------------
+
+PROFILE_ENV = 'CHALLENGE_PROFILE'
+PROFILE_FILE_ENV = 'CHALLENGE_PROFILE_FILE'
+
+_options = None
+_stages = []
+
+
+class Stage:
+
+    def __init__(self, name):
+        self.name = name
+        self.rows_in = None
+        self.rows_out = None
+
+    def __enter__(self):
+        if _options is None:
+            return self
+        if 'tracemalloc' in _options:
+            import tracemalloc
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            else:
+                # Python < 3.9 (pyspark image): forgetting the traced blocks
+                # resets the peak as well; the frees of the forgotten blocks
+                # are not seen, so the peak may be a little higher
+                tracemalloc.clear_traces()
+            self._traced = tracemalloc.get_traced_memory()[0]
+        self._rss = _current_rss()
+        self._peak_rss = _peak_rss()
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if _options is None:
+            return
+        record = {'stage': self.name,
+                  'wall_seconds': time.perf_counter() - self._wall,
+                  'cpu_seconds': time.process_time() - self._cpu,
+                  'rss_delta_bytes': _current_rss() - self._rss,
+                  'peak_rss_delta_bytes': _peak_rss() - self._peak_rss,
+                  'rows_in': self.rows_in,
+                  'rows_out': self.rows_out}
+        if 'tracemalloc' in _options:
+            import tracemalloc
+            record['traced_peak_bytes'] = tracemalloc.get_traced_memory()[1] - self._traced
+        _stages.append(record)
+
+
+# Current resident set size in bytes (Linux), or the peak RSS elsewhere
+def _current_rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return _peak_rss()
+
+# Peak resident set size in bytes (ru_maxrss is in kilobytes on Linux)
+def _peak_rss():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def enabled():
+    return _options is not None
+
+# Enables profiling with the given options (see above)
+def enable(options='table'):
+    global _options
+    if _options is None:
+        atexit.register(report)
+    _options = {option.strip() for option in options.split(',') if option.strip()}
+    if 'tracemalloc' in _options:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+# Returns a context manager that profiles a stage
+def stage(name):
+    return Stage(name)
+
+def _format_table(script):
+    mb = 2 ** 20
+    lines = [f'Profile of {script}',
+             '------------------------------------------------------------------------------------------------',
+             'stage                     |  wall s |   cpu s | RSS delta MB | peak delta MB |   rows in |  rows out',
+             '------------------------------------------------------------------------------------------------']
+    for record in _stages:
+        lines.append("{} | {} | {} | {} | {} | {} | {}".format(record['stage'][:25].ljust(25),
+                                                               f"{record['wall_seconds']:.3f}".rjust(7),
+                                                               f"{record['cpu_seconds']:.3f}".rjust(7),
+                                                               f"{record['rss_delta_bytes'] / mb:.1f}".rjust(12),
+                                                               f"{record['peak_rss_delta_bytes'] / mb:.1f}".rjust(13),
+                                                               str(record['rows_in'] if record['rows_in'] is not None else '-').rjust(9),
+                                                               str(record['rows_out'] if record['rows_out'] is not None else '-').rjust(9)))
+        if 'traced_peak_bytes' in record:
+            lines[-1] += f" | traced peak {record['traced_peak_bytes'] / mb:.1f} MB"
+    lines.append('------------------------------------------------------------------------------------------------')
+    return '\n'.join(lines) + '\n'
+
+# Writes the report of the recorded stages (registered at exit by enable)
+def report():
+    if not _stages:
+        return
+    # <solution>/test.py
+    path = os.path.abspath(sys.argv[0]) if sys.argv and sys.argv[0] else ''
+    script = os.path.join(os.path.basename(os.path.dirname(path)), os.path.basename(path))
+    if 'json' in _options:
+        text = ''.join(json.dumps(dict(record, script=script)) + '\n' for record in _stages)
+    else:
+        text = _format_table(script)
+    output_path = os.environ.get(PROFILE_FILE_ENV)
+    if output_path:
+        with open(output_path, 'a') as f:
+            f.write(text)
+    else:
+        sys.stderr.write(text)
+    _stages.clear()
+
+
+if os.environ.get(PROFILE_ENV):
+    enable(os.environ[PROFILE_ENV])
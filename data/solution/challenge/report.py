@@ -0,0 +1,76 @@
+from collections import namedtuple
+
+# --------------------------------------------------------------
+# Definitions and report shared by the solutions
+# --------------------------------------------------------------
+# Query 1: the number of unique students who submitted at least 1 test
+#          each day, for the last CONSECUTIVE_DAYS days of data available.
+# Query 2: the same with valid submissions only (grade > 0).
+# Query 3: the student with the most submissions for each day of the
+#          last CONSECUTIVE_DAYS days of data available (lowest student_id
+#          on ties), or the top_k students ordered by rank.
+# Query 4: the average grade of each test, counting one grade per
+#          (test, student) pair:
+#            A: the average grade per test
+#            B: a single submission of the pair counts with its grade,
+#               even if invalid
+#            C: multiple submissions count with the last valid grade (on
+#               equal submission times, the one with the highest
+#               submission_id)
+#            D: if all the multiple submissions are invalid, the pair
+#               counts with a 0 grade (see the remark in README.md)
+#
+# Results holds the answers of a backend (see challenge/backends) as
+# plain Python values:
+#
+#   query1, query2 -> int
+#   query3         -> [(submission_date, student_id, count)] ordered by
+#                     date and rank (dates are datetime.date or anything
+#                     with strftime)
+#   query4         -> [(test_id, avg_grade)] ordered by test_id
+#
+# The report has the layout of the python and sql solutions, which is
+# parsed by challenge/benchmark.py.
+# --------------------------------------------------------------
+
+CONSECUTIVE_DAYS = 15
+
+EMPTY_DATA_MESSAGE = 'At least one CSV file is empty. Processing interrupted. Please provide non-empty CSV files.'
+
+Results = namedtuple('Results', ['query1', 'query2', 'query3', 'query4'])
+
+
+# Raises the error of the solutions if no row is left after the joins
+def check_rows(rows):
+    if not rows:
+        raise Exception(EMPTY_DATA_MESSAGE)
+
+def print_count(number, count):
+    print(f'\nResult #{number}: {count}')
+
+def print_query3(rows):
+    print(f'\nResult #3:')
+    print('------------------------------------')
+    print('submission_date | student_id | count')
+    print('------------------------------------')
+    for day, student_id, count in rows:
+        print("{} | {} | {}".format(day.strftime('%Y-%m-%d').ljust(15),
+                                    str(student_id).rjust(10),
+                                    str(count).rjust(5)))
+    print('------------------------------------')
+
+def print_query4(rows):
+    print(f'\nResult #4:')
+    print('-------------------')
+    print('test_id | avg_grade')
+    print('-------------------')
+    for test_id, avg_grade in rows:
+        print("{} | {:.2f}".format(str(test_id).rjust(7),
+                                   round(avg_grade, 2)))
+    print('-------------------')
+
+def print_results(results):
+    print_count(1, results.query1)
+    print_count(2, results.query2)
+    print_query3(results.query3)
+    print_query4(results.query4)
@@ -0,0 +1,81 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from challenge.backends.pandas import query4
+
+# ----------------------------------------------------------------------------------
+#  Benchmark of Query 4 across group counts
+#
+#  Compares the former groupby().apply() callback with the vectorized selection
+#  of the relevant submission per (student_id, test_id) group (query4() of
+#  challenge/backends/pandas.py), checks that both give the same average grades
+#  and prints the time spent by each of them.
+#
+#  Usage: python bench_query4.py [--groups N [N ...]] [--rows-per-group N]
+# ----------------------------------------------------------------------------------
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--groups', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+parser.add_argument('--rows-per-group', type=int, default=3)
+args = parser.parse_args()
+
+# Builds submissions for the given number of (student_id, test_id) groups,
+# with about a third of invalid grades and sorted by submission_time (and
+# submission_id, so the last row of a group is the one query4() selects on
+# equal times)
+def make_submissions(groups, rows_per_group, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = groups * rows_per_group
+    group = rng.integers(0, groups, rows)
+    df = pd.DataFrame({
+        'submission_id': np.arange(1, rows + 1),
+        'student_id': group // 100,
+        'test_id': group % 100,
+        'submission_time': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 365 * 86400, rows), unit='s'),
+        'grade': rng.integers(0, 101, rows) * (rng.random(rows) > 0.33),
+    })
+    return df.sort_values(by=['submission_time', 'submission_id'])
+
+# Former implementation: one Python callback per group
+def apply_query4(df):
+    def get_relevant_submission(student_test_df):
+        valid_student_test_df = student_test_df[student_test_df['grade'] > 0]
+        if not valid_student_test_df.empty:
+            return valid_student_test_df.iloc[-1]
+        else:
+            return student_test_df.iloc[-1]
+    selected_submissions = df \
+        .groupby(['student_id', 'test_id'])[['submission_time', 'grade']] \
+        .apply(get_relevant_submission) \
+        .reset_index()
+    return selected_submissions.groupby('test_id')['grade'].mean()
+
+# Vectorized implementation of the solution, as a Series like the former one
+def vectorized_query4(df):
+    return query4(df).set_index('test_id')['avg_grade']
+
+def timed(func, df):
+    started = time.perf_counter()
+    result = func(df)
+    return result, time.perf_counter() - started
+
+print('-----------------------------------------------------')
+print('    groups |       rows |  apply (s) | vectorized (s)')
+print('-----------------------------------------------------')
+for groups in args.groups:
+    df = make_submissions(groups, args.rows_per_group)
+    expected, apply_seconds = timed(apply_query4, df)
+    result, vectorized_seconds = timed(vectorized_query4, df)
+    if not np.allclose(expected.to_numpy(), result.to_numpy()) or not expected.index.equals(result.index):
+        raise Exception(f'Query 4 results differ for {groups} groups.')
+    print("{} | {} | {} | {}".format(str(groups).rjust(10),
+                                     str(df.shape[0]).rjust(10),
+                                     f'{apply_seconds:.3f}'.rjust(10),
+                                     f'{vectorized_seconds:.3f}'.rjust(14)))
+print('-----------------------------------------------------')
@@ -0,0 +1,106 @@
+import pandas as pd
+
+# -------------------------
+#  Chunked (out-of-core) mode
+# -------------------------
+#
+# The submissions are read in chunks of a fixed number of rows. Each chunk is
+# joined with the lookups (student and test ids, grades indexed by
+# submission_id) and reduced into partial aggregates, which are merged into
+# the running state:
+#
+#   daily        -> (student_id, submission_date): count, valid_count
+#                   (Queries 1-3, only the days of the window of the latest
+#                   date seen so far are kept, since the latest date only grows)
+#   last_grades  -> (student_id, test_id): is_valid, submission_time,
+#                   submission_id, grade of the selected submission (Query 4)
+#
+# Both merges are commutative: counts are added and, for Query 4, the
+# submission that sorts last by (is_valid, submission_time, submission_id) is
+# kept, i.e. the last valid submission (rule C) or, if all are invalid, the last
+# one with a 0 grade (rule D). Equal times are decided by the highest
+# submission_id, so the result does not depend on the chunk order either.
+#
+# Peak memory is bounded by the chunk size plus the number of distinct keys
+# (students x window days and (student, test) pairs) plus the grade lookup
+# (a few bytes per grade).
+# -------------------------
+
+
+class ChunkAggregates:
+
+    def __init__(self, consecutive_days):
+        self.consecutive_days = consecutive_days
+        self.rows = 0
+        self.max_date = None
+        self.daily = None
+        self.last_grades = None
+
+    def window_start(self):
+        return self.max_date - pd.Timedelta(days=self.consecutive_days - 1)
+
+    # Keeps the last (valid) submission of each (student_id, test_id) pair
+    @staticmethod
+    def select_last(submissions):
+        return submissions \
+            .sort_values(by=['is_valid', 'submission_time', 'submission_id'], kind='stable') \
+            .drop_duplicates(subset=['student_id', 'test_id'], keep='last')
+
+    # Merges a chunk of joined submissions (with grade and submission_date)
+    def update(self, chunk):
+        if chunk.shape[0] == 0:
+            return self
+        self.rows += chunk.shape[0]
+        chunk_max = chunk['submission_date'].max()
+        self.max_date = chunk_max if self.max_date is None else max(self.max_date, chunk_max)
+        start = self.window_start()
+
+        # Queries 1-3: count all and valid submissions per (student, day) of the window
+        recent = chunk[chunk['submission_date'] >= start]
+        if recent.shape[0] > 0:
+            daily = recent \
+                .assign(valid=(recent['grade'] > 0).astype('int64')) \
+                .groupby(['student_id', 'submission_date']) \
+                .agg(count=('valid', 'size'), valid_count=('valid', 'sum'))
+            if self.daily is not None:
+                daily = pd.concat([self.daily[self.daily.index.get_level_values('submission_date') >= start], daily]) \
+                    .groupby(level=['student_id', 'submission_date']) \
+                    .sum()
+            self.daily = daily
+
+        # Query 4: the selected submission per (student, test)
+        last_grades = self.select_last(chunk[['student_id', 'test_id', 'submission_time', 'submission_id', 'grade']]
+                                       .assign(is_valid=chunk['grade'] > 0))
+        if self.last_grades is not None:
+            last_grades = self.select_last(pd.concat([self.last_grades, last_grades]))
+        self.last_grades = last_grades
+        return self
+
+    # Number of students with (valid) submissions on each day of the window
+    def count_every_day(self, valid_only):
+        daily = self.daily[self.daily['valid_count'] > 0] if valid_only else self.daily
+        return int((daily.groupby(level='student_id').size() == self.consecutive_days).sum())
+
+    def query1(self):
+        return self.count_every_day(valid_only=False)
+
+    def query2(self):
+        return self.count_every_day(valid_only=True)
+
+    # Same result frame as the in-memory mode (see challenge/backends/pandas.py):
+    # the top_k submitters per submission_date
+    def query3(self, top_k=1):
+        return self.daily['count'] \
+            .reset_index() \
+            .sort_values(by=['submission_date', 'count', 'student_id'],
+                         ascending=[True, False, True]) \
+            .groupby('submission_date') \
+            .head(top_k)[['submission_date', 'student_id', 'count']] \
+            .reset_index(drop=True)
+
+    def query4(self):
+        return self.last_grades \
+            .groupby('test_id')['grade'] \
+            .mean() \
+            .reset_index() \
+            .rename(columns={'grade': 'avg_grade'})
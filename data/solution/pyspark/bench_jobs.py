@@ -0,0 +1,39 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+# ----------------------------------------------------------------------------------
+#  Benchmark of the Spark execution modes
+#
+#  Runs test.py in local mode with each execution mode against the CSV files of a
+#  data directory and prints the wall time and the number of Spark jobs and stages
+#  of each run (see --report-jobs in test.py).
+#
+#  Usage: python bench_jobs.py [--data DIR] [--master local[N]]
+# ----------------------------------------------------------------------------------
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--data', default='.', help='directory of the CSV files')
+parser.add_argument('--master', default='local[*]')
+args = parser.parse_args()
+
+script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test.py')
+env = dict(os.environ, PYSPARK_SUBMIT_ARGS=f'--master {args.master} pyspark-shell')
+
+print('------------------------------------------------')
+print('       mode |  seconds |     jobs |      stages')
+print('------------------------------------------------')
+for mode in ['legacy', 'single-scan']:
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, script, '--mode', mode, '--report-jobs'],
+                            cwd=args.data, env=env, capture_output=True, text=True, check=True).stdout
+    seconds = time.perf_counter() - started
+    jobs, stages = re.search(r'Spark jobs: (\d+), stages: (\d+)', output).groups()
+    print("{} | {} | {} | {}".format(mode.rjust(11),
+                                     f'{seconds:.1f}'.rjust(8),
+                                     jobs.rjust(8),
+                                     stages.rjust(11)))
+print('------------------------------------------------')
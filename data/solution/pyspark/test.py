@@ -1,123 +1,177 @@
-from pyspark.sql import SparkSession, Row
+from pyspark.sql import Row
 import pyspark.sql.functions as F
 from pyspark.sql.window import Window
 from pyspark.sql.functions import udf as udf
 from pyspark.sql.functions import col as col
 from datetime import datetime, timedelta
-
-spark = SparkSession.builder.appName('TestChallenge#1App').getOrCreate()
-
-# Load all CSVs
-students = spark.read.csv('students.csv', header=True, inferSchema=True)
-tests = spark.read.csv('tests.csv', header=True, inferSchema=True)
-submissions = spark.read.csv('submissions.csv', header=True, inferSchema=True)
-grades = spark.read.csv('grades.csv', header=True, inferSchema=True)
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from challenge import profiling, report
+from challenge.backends.spark import BUCKETS, ingest, layout_scan, load, session, single_scan
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--mode', choices=['single-scan', 'legacy'], default='single-scan',
+                    help='single-scan: persisted join feeding one aggregation for all queries (default), '
+                         'legacy: independent jobs per query')
+parser.add_argument('--layout', action='store_true',
+                    help='ingest the join once into a Parquet table partitioned by submission_date and '
+                         'bucketed by student_id (spark_layout/, see challenge/backends/spark.py) '
+                         'and answer from it')
+parser.add_argument('--buckets', type=int, default=BUCKETS,
+                    help=f'number of buckets of the layout table (default {BUCKETS})')
+parser.add_argument('--report-jobs', action='store_true',
+                    help='print the number of Spark jobs and stages of the run')
+parser.add_argument('--report-exchanges', action='store_true',
+                    help='print the number of Exchange nodes of the physical plan of every query')
+args = parser.parse_args()
+if args.layout and args.mode != 'single-scan':
+    parser.error('--layout is only supported by the single-scan mode')
+if args.buckets < 1:
+    parser.error('--buckets must be at least 1')
+
+spark = session()
 
 # Param
-CONSECUTIVE_DAYS = 15
-
-# Join all dataframes
-df = students \
-    .join(submissions, on='student_id') \
-    .join(tests, on='test_id') \
-    .join(grades, on='submission_id')
-
-# Cast submission_time into date 
-df = df.withColumn('submission_date', 
-                   F.to_date(F.substring('submission_time', 1, 10),'yyyy-MM-dd'))
-
-#  Validate
-if df.count() == 0:
-    raise Exception('At least one CSV file is empty. Processing interrupted. Please provide non-empty CSV files.')
-
-# Calculate min/max dates
-max_date = df.agg(F.max('submission_date').alias('max_date')).collect()[0].max_date
-min_date = max_date - timedelta(days=CONSECUTIVE_DAYS-1)
-
-# Add submission_start column
-df = df.withColumn('submission_start', F.lit(min_date))
-
-# ----------
-#  Query 1
-# ----------
-
-result1 = df \
-    .where(col('submission_date') >= col('submission_start')) \
-    .select('student_id', 'submission_date') \
-    .distinct() \
-    .groupby('student_id') \
-    .count() \
-    .where(col('count') == CONSECUTIVE_DAYS) \
-    .count()
-print(f'\nResult #1: {result1}')
-
-# ----------
-#  Query 2
-# ----------
-
-result2 = df \
-    .where(col('submission_date') >= col('submission_start')) \
-    .where(col('grade') > 0) \
-    .select('student_id', 'submission_date') \
-    .distinct() \
-    .groupby('student_id') \
-    .count() \
-    .where(col('count') == CONSECUTIVE_DAYS) \
-    .count()
-print(f'\nResult #2: {result2}')
-
-# ----------
-#  Query 3
-# ----------
-
-print('\nResult #3:')
-df \
-    .where(col('submission_date') >= col('submission_start')) \
-    .groupby('student_id', 'submission_date') \
-    .count() \
-    .withColumn('sort', F.row_number().over(Window.partitionBy('submission_date')                                                                                         .orderBy(F.desc('count'), 'student_id'))) \
-    .where(col('sort') == 1) \
-    .select('submission_date', 'student_id', 'count') \
-    .sort('submission_date') \
-    .show(50)
-
-# ----------
-#  Query 4
-# ----------
-
-# Add count and sum(grade) per (student, test) group
-df2 = df.select('student_id', 'test_id', 'submission_time', 'grade') \
-    .withColumn('count', F.count('*').over(Window.partitionBy('student_id', 'test_id'))) \
-    .withColumn('grade_total', F.sum('grade').over(Window.partitionBy('student_id', 'test_id')))
-
-# Extract single (student, test) submissions
-single_df = df2.where(col('count') == 1).drop('count')
-
-# Extract multiple (student, test) submissions where all submissions are invalid
-multiple_invalid_df = df2 \
-    .where(col('count') > 1).drop('count') \
-    .where(col('grade_total') == 0) 
-
-# Extract multiple (student, test) submissions with at least one valid submission
-# and filter out the invalid submissions
-multiple_valid_df = df2 \
-    .where(col('count') > 1).drop('count') \
-    .where(col('grade_total') > 0) \
-    .where(col('grade') > 0)
-
-# Union all 3 sub-datasets
-df3 = single_df \
-    .unionByName(multiple_invalid_df) \
-    .unionByName(multiple_valid_df)
-
-# Select last (student, test) row and compute the grade average
-result4 = df3 \
-    .withColumn('sort', F.row_number().over(Window.partitionBy('student_id', 'test_id')                                                                                   .orderBy(F.desc('submission_time')))) \
-    .where(col('sort') == 1) \
-    .groupby('test_id') \
-    .agg(F.mean('grade').alias('avg_grade'))
-
-print('Result #4:')
-result4.sort('test_id').show()
-
-spark.stop()
\ No newline at end of file
+CONSECUTIVE_DAYS = report.CONSECUTIVE_DAYS
+
+# Join all dataframes and cast submission_time into date
+# (see challenge/backends/spark.py)
+df = load(spark, '.')
+
+# Exchange nodes per query, if reported
+exchanges = {} if args.report_exchanges else None
+
+# ----------------------------------------------------------------------------------
+#  Legacy mode
+#
+#  Every query is an independent set of jobs over the (not persisted) join.
+# ----------------------------------------------------------------------------------
+
+def run_legacy(df):
+    #  Validate
+    with profiling.stage('validate') as stage:
+        rows = stage.rows_out = df.count()
+    report.check_rows(rows)
+
+    # Calculate min/max dates
+    max_date = df.agg(F.max('submission_date').alias('max_date')).collect()[0].max_date
+    min_date = max_date - timedelta(days=CONSECUTIVE_DAYS-1)
+
+    # Add submission_start column
+    df = df.withColumn('submission_start', F.lit(min_date))
+
+    # ----------
+    #  Query 1
+    # ----------
+
+    with profiling.stage('query 1'):
+        result1 = df \
+            .where(col('submission_date') >= col('submission_start')) \
+            .select('student_id', 'submission_date') \
+            .distinct() \
+            .groupby('student_id') \
+            .count() \
+            .where(col('count') == CONSECUTIVE_DAYS) \
+            .count()
+    print(f'\nResult #1: {result1}')
+
+    # ----------
+    #  Query 2
+    # ----------
+
+    with profiling.stage('query 2'):
+        result2 = df \
+            .where(col('submission_date') >= col('submission_start')) \
+            .where(col('grade') > 0) \
+            .select('student_id', 'submission_date') \
+            .distinct() \
+            .groupby('student_id') \
+            .count() \
+            .where(col('count') == CONSECUTIVE_DAYS) \
+            .count()
+    print(f'\nResult #2: {result2}')
+
+    # ----------
+    #  Query 3
+    # ----------
+
+    print('\nResult #3:')
+    with profiling.stage('query 3'):
+        df \
+            .where(col('submission_date') >= col('submission_start')) \
+            .groupby('student_id', 'submission_date') \
+            .count() \
+            .withColumn('sort', F.row_number().over(Window.partitionBy('submission_date')                                                                                         .orderBy(F.desc('count'), 'student_id'))) \
+            .where(col('sort') == 1) \
+            .select('submission_date', 'student_id', 'count') \
+            .sort('submission_date') \
+            .show(50)
+
+    # ----------
+    #  Query 4
+    # ----------
+
+    # Add count and sum(grade) per (student, test) group
+    df2 = df.select('student_id', 'test_id', 'submission_time', 'submission_id', 'grade') \
+        .withColumn('count', F.count('*').over(Window.partitionBy('student_id', 'test_id'))) \
+        .withColumn('grade_total', F.sum('grade').over(Window.partitionBy('student_id', 'test_id')))
+
+    # Extract single (student, test) submissions
+    single_df = df2.where(col('count') == 1).drop('count')
+
+    # Extract multiple (student, test) submissions where all submissions are invalid
+    multiple_invalid_df = df2 \
+        .where(col('count') > 1).drop('count') \
+        .where(col('grade_total') == 0) 
+
+    # Extract multiple (student, test) submissions with at least one valid submission
+    # and filter out the invalid submissions
+    multiple_valid_df = df2 \
+        .where(col('count') > 1).drop('count') \
+        .where(col('grade_total') > 0) \
+        .where(col('grade') > 0)
+
+    # Union all 3 sub-datasets
+    df3 = single_df \
+        .unionByName(multiple_invalid_df) \
+        .unionByName(multiple_valid_df)
+
+    # Select last (student, test) row (the highest submission_id on equal
+    # times) and compute the grade average
+    result4 = df3 \
+        .withColumn('sort', F.row_number().over(Window.partitionBy('student_id', 'test_id')                                                                                   .orderBy(F.desc('submission_time'), F.desc('submission_id')))) \
+        .where(col('sort') == 1) \
+        .groupby('test_id') \
+        .agg(F.mean('grade').alias('avg_grade'))
+
+    print('Result #4:')
+    with profiling.stage('query 4'):
+        result4.sort('test_id').show()
+
+
+if args.mode == 'legacy':
+    run_legacy(df)
+elif args.layout:
+    # The layout table is partitioned and bucketed so that the queries
+    # reuse it instead of exchanging the rows (see challenge/backends/spark.py)
+    report.print_results(layout_scan(spark, ingest(spark, '.', args.buckets), CONSECUTIVE_DAYS,
+                                     exchanges=exchanges))
+else:
+    # The persisted join feeds one aggregation for Queries 1-3 and the
+    # window of Query 4 (see challenge/backends/spark.py)
+    report.print_results(single_scan(df, CONSECUTIVE_DAYS, exchanges=exchanges))
+
+if args.report_jobs:
+    tracker = spark.sparkContext.statusTracker()
+    jobs = tracker.getJobIdsForGroup()
+    stages = sum(len(tracker.getJobInfo(job).stageIds) for job in jobs)
+    print(f'\nSpark jobs: {len(jobs)}, stages: {stages}')
+
+if exchanges:
+    counts = ', '.join(f'{name}: {count}' for name, count in exchanges.items())
+    print(f'\nExchange nodes: {sum(exchanges.values())} ({counts})')
+
+spark.stop()
@@ -0,0 +1,167 @@
+from engine import GradeAggregates
+from sketches import BottomK, Estimate, HeavyHitters, HyperLogLog, hash64, intersection
+
+# --------------------------------------------------------------
+# Approximate engine
+# --------------------------------------------------------------
+# Queries 1 to 3 answered from fixed-size sketches per day (see
+# sketches.py) instead of per-student state, for tenants where the
+# exact day bitmasks and counters no longer fit in memory:
+#
+#   submitters, valid_submitters     -> HyperLogLog of the day's
+#                                       (valid) submitters
+#   sample, valid_sample             -> BottomK of the day's (valid)
+#                                       submitters
+#   top                              -> HeavyHitters of the day's
+#                                       submissions
+#
+# Queries 1 and 2 count the students present on every day of the
+# window, i.e. the intersection of its daily submitters. HyperLogLog
+# only estimates unions well, so the intersection is estimated from the
+# BottomK samples (exact as long as fewer than k students submitted in
+# the window); the HyperLogLogs give the distinct submitters of each day
+# (see daily()). Query 3 ranks the heavy hitter candidates of each day
+# by their CountMin counts.
+#
+# Only the days of the window are kept: the last date only moves
+# forward, so a day that falls out of the window is dropped with its
+# sketches, and the memory is bounded by the window length whatever the
+# number of students or days of data. Query 4 is exact (see
+# GradeAggregates in engine.py).
+#
+# Every sketch is mergeable, so partial aggregates of separate
+# partitions merge like the exact ones (see parallel.py).
+# --------------------------------------------------------------
+
+
+class DaySketches:
+
+    def __init__(self, capacity):
+        self.submitters = HyperLogLog()
+        self.valid_submitters = HyperLogLog()
+        self.sample = BottomK()
+        self.valid_sample = BottomK()
+        self.top = HeavyHitters(capacity)
+
+    def merge(self, other):
+        self.submitters.merge(other.submitters)
+        self.valid_submitters.merge(other.valid_submitters)
+        self.sample.merge(other.sample)
+        self.valid_sample.merge(other.valid_sample)
+        self.top.merge(other.top)
+        return self
+
+
+class SketchAggregates(GradeAggregates):
+
+    # Candidates of the heavy hitters per day (at least twice top_k)
+    CANDIDATES = 8
+
+    def __init__(self, consecutive_days, top_k=1):
+        super().__init__()
+        self.consecutive_days = consecutive_days
+        self.capacity = max(self.CANDIDATES, 2 * top_k)
+        self.rows = 0
+        self.last_date = None
+        self.days = {}  # submission_date -> DaySketches
+
+    # Consumes an iterable of submission rows, joining each row with its grade
+    # from a GradeTable (see grades.py); a missing grade counts as 0
+    def consume(self, submissions, grades):
+        grade_of = grades.get
+        for submission_id, test_id, student_id, submission_time, submission_date in submissions:
+            self.update(submission_id, test_id, student_id, submission_time, submission_date, grade_of(submission_id))
+        return self
+
+    def update(self, submission_id, test_id, student_id, submission_time, submission_date, grade):
+        self.rows += 1
+        self.update_grade(submission_id, test_id, student_id, submission_time, grade)
+        if self.last_date is None or submission_date > self.last_date:
+            self.last_date = submission_date
+            self._evict()
+
+        sketches = self.days.get(submission_date)
+        if sketches is None:
+            if submission_date <= self.last_date - self.consecutive_days:
+                return
+            sketches = self.days[submission_date] = DaySketches(self.capacity)
+        h = hash64(student_id)
+        sketches.submitters.add(h)
+        sketches.sample.add(h)
+        sketches.top.add(student_id, h)
+        if grade > 0:
+            sketches.valid_submitters.add(h)
+            sketches.valid_sample.add(h)
+
+    # Drops the days that fell out of the window
+    def _evict(self):
+        for day in [day for day in self.days if day <= self.last_date - self.consecutive_days]:
+            del self.days[day]
+
+    # Merges the state of another SketchAggregates into this one (see
+    # Aggregates.merge in engine.py)
+    def merge(self, other):
+        self.rows += other.rows
+        if other.last_date is not None and (self.last_date is None or other.last_date > self.last_date):
+            self.last_date = other.last_date
+        for day, sketches in other.days.items():
+            if day in self.days:
+                self.days[day].merge(sketches)
+            else:
+                self.days[day] = sketches
+        self._evict()
+        self.merge_grades(other)
+        return self
+
+    # Returns the list of the last consecutive_days dates of data available
+    def window(self):
+        return list(range(self.last_date - self.consecutive_days + 1, self.last_date + 1))
+
+    # Returns the sketches of every day of the window, or None if a day has
+    # no submission (then no student submitted on every day)
+    def _window_samples(self, valid):
+        sketches = [self.days.get(day) for day in self.window()]
+        if None in sketches:
+            return None
+        return [s.valid_sample if valid else s.sample for s in sketches]
+
+    # --------------------
+    # Query 1
+    # --------------------
+    # Estimate of the number of students in the intersection of the daily
+    # submitters of the window.
+    def query1(self):
+        samples = self._window_samples(valid=False)
+        return intersection(samples) if samples else Estimate(0, 0)
+
+    # --------------------
+    # Query 2
+    # --------------------
+    # Same as Query 1 with the valid submitters (grade > 0).
+    def query2(self):
+        samples = self._window_samples(valid=True)
+        return intersection(samples) if samples else Estimate(0, 0)
+
+    # --------------------
+    # Query 3
+    # --------------------
+    # For each date of the window, the top_k candidates by estimated count
+    # (and the lowest student_ids in case of ties). Returns a list of
+    # (submission_date, student_id, Estimate of the count) ordered by date
+    # and rank; the count is overestimated by at most the error.
+    def query3(self, top_k=1):
+        result = []
+        for day in self.window():
+            sketches = self.days.get(day)
+            if sketches:
+                error = sketches.top.counts.error()
+                for student_id, count in sketches.top.top(top_k):
+                    result.append((day, student_id, Estimate(count, error)))
+        return result
+
+    # Returns (submission_date, Estimate of the submitters, Estimate of the
+    # valid submitters, error of the counts of Query 3) for every date of
+    # the window with submissions
+    def daily(self):
+        return [(day, sketches.submitters.count(), sketches.valid_submitters.count(), sketches.top.counts.error())
+                for day, sketches in sorted(self.days.items())]
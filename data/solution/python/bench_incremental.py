@@ -0,0 +1,131 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from engine import Aggregates
+from incremental import Snapshot
+from sources import load_grades, load_submissions
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from challenge import report
+from challenge.backends.python import answer
+from challenge.generate import generate
+
+# --------------------------------------------------------------
+# Check of the incremental mode on a growing dataset
+# --------------------------------------------------------------
+# Generates a dataset (see challenge/generate.py) and appends its
+# submissions in time order to empty CSV files in --steps batches, with
+# the grades of every batch appended one batch later, so they arrive
+# after their submissions were ingested (with --ungraded-rate, some
+# never arrive). After every batch a snapshot is refreshed and saved
+# (see incremental.py), and the rows ingested, the ungraded submissions
+# and pending grades kept and the size of the snapshot file are printed.
+#
+# Checks that:
+#
+#   - the ungraded submissions kept are those whose grade can still
+#     change the results (within the window, or newer than the last
+#     valid grade of their pair), so the snapshot stays bounded while
+#     the rows grow: the number kept at the end of the appends is at
+#     most 1.5 times the number kept halfway
+#   - the results after the last batch are those of a full run of the
+#     stream engine
+#
+# Usage: python bench_incremental.py [--submissions N] [--students N] [--tests N]
+#                                    [--ungraded-rate R] [--steps N]
+#
+# With 400k submissions of 100 students and 20 tests over 365 days in
+# 40 batches, half of them without a grade, Python 3.11:
+#
+#          rows |   ungraded |  pending |  snapshot KB
+#         10000 |      10000 |        0 |        279.3
+#        200000 |      14290 |        0 |        399.8
+#        400000 |      14927 |        0 |        413.3
+#        400000 |       9298 |        0 |        294.2   (last grades appended)
+#
+# The ungraded submissions kept are about half of those of the window
+# (~16k rows) and of the batch waiting for its grades, plus the pairs
+# whose last submissions have no grade. They were all kept before, 200k
+# here. The snapshot only grows by the bitmap of the ingested ids.
+# --------------------------------------------------------------
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--submissions', type=int, default=400_000)
+parser.add_argument('--students', type=int, default=100)
+parser.add_argument('--tests', type=int, default=20)
+parser.add_argument('--ungraded-rate', type=float, default=0.5)
+parser.add_argument('--steps', type=int, default=40)
+parser.add_argument('--days', type=int, default=report.CONSECUTIVE_DAYS)
+args = parser.parse_args()
+if args.steps < 1:
+    parser.error('--steps must be at least 1')
+
+def read_lines(path):
+    with open(path) as f:
+        return f.readline(), f.readlines()
+
+# Ungraded submissions whose grade can still change the results (see
+# Snapshot.expire_ungraded in incremental.py)
+def useful(snapshot, submission_id, test_id, student_id, submission_time, submission_date):
+    aggregates = snapshot.aggregates
+    order = aggregates.last_grades[(test_id, student_id)][0]
+    return submission_date > aggregates.last_date - aggregates.consecutive_days \
+        or order is None or submission_time << 32 | submission_id > order
+
+with tempfile.TemporaryDirectory() as work_dir:
+    source_dir, data_dir = os.path.join(work_dir, 'source'), os.path.join(work_dir, 'data')
+    generate(source_dir, args.submissions, students=args.students, tests=args.tests,
+             ungraded_rate=args.ungraded_rate)
+    submissions_header, submissions = read_lines(os.path.join(source_dir, 'submissions.csv'))
+    grades_header, grades = read_lines(os.path.join(source_dir, 'grades.csv'))
+    submissions.sort(key=lambda line: line.rsplit(',', 1)[1])
+    grade_lines = {line.split(',', 1)[0]: line for line in grades}
+
+    os.makedirs(data_dir)
+    submissions_path, grades_path = os.path.join(data_dir, 'submissions.csv'), os.path.join(data_dir, 'grades.csv')
+    state_path = os.path.join(data_dir, 'state.pickle')
+    with open(submissions_path, 'w') as f:
+        f.write(submissions_header)
+    with open(grades_path, 'w') as f:
+        f.write(grades_header)
+
+    print('-------------------------------------------------------------')
+    print('        rows |   ungraded |  pending |  snapshot KB | refresh s')
+    print('-------------------------------------------------------------')
+    snapshot = Snapshot(args.days)
+    batch_size = -(-len(submissions) // args.steps)
+    late = []
+    kept_halfway = None
+    for step in range(args.steps + 1):
+        batch = submissions[step * batch_size:(step + 1) * batch_size]
+        with open(submissions_path, 'a') as f:
+            f.writelines(batch)
+        with open(grades_path, 'a') as f:
+            f.writelines(late)
+        late = [grade_lines[line.split(',', 1)[0]] for line in batch if line.split(',', 1)[0] in grade_lines]
+
+        started = time.perf_counter()
+        snapshot.refresh(submissions_path, grades_path).save(state_path)
+        seconds = time.perf_counter() - started
+        kept = [submission_id for submission_id, submission in snapshot.ungraded.items()
+                if not useful(snapshot, submission_id, *submission)]
+        if kept:
+            raise Exception(f'{len(kept)} ungraded submissions kept that cannot change the results')
+        if step == args.steps // 2:
+            kept_halfway = len(snapshot.ungraded)
+        elif step == args.steps - 1 and len(snapshot.ungraded) > 1.5 * kept_halfway:
+            raise Exception(f'the ungraded submissions kept grew from {kept_halfway} to {len(snapshot.ungraded)}')
+        print("{} | {} | {} | {} | {}".format(str(snapshot.aggregates.rows).rjust(12),
+                                              str(len(snapshot.ungraded)).rjust(10),
+                                              str(len(snapshot.pending_grades)).rjust(8),
+                                              f'{os.path.getsize(state_path) / 1024:.1f}'.rjust(12),
+                                              f'{seconds:.2f}'.rjust(9)))
+    print('-------------------------------------------------------------')
+
+    full = Aggregates(args.days).consume(load_submissions(data_dir), load_grades(data_dir))
+    if answer(snapshot.aggregates, 3) != answer(full, 3):
+        raise Exception('the results of the incremental mode differ from a full run')
+    print('results equal to a full run: True')
@@ -0,0 +1,53 @@
+import argparse
+import os
+import sys
+import time
+
+from engine import Aggregates, read_submissions
+from grades import GradeTable
+from parallel import aggregate_parallel
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from challenge import report
+
+# --------------------------------------------------------------
+# Scaling benchmark of the parallel mode
+# --------------------------------------------------------------
+# Aggregates the submissions of a data directory serially and then
+# with each number of worker processes, checks that the answers of
+# the four queries are identical and prints the time and speedup.
+#
+# Usage: python bench_parallel.py [--data DIR] [--workers N [N ...]]
+# --------------------------------------------------------------
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--data', default='.', help='directory of submissions.csv and grades.csv')
+parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+parser.add_argument('--days', type=int, default=report.CONSECUTIVE_DAYS)
+args = parser.parse_args()
+
+submissions_path = os.path.join(args.data, 'submissions.csv')
+grades_path = os.path.join(args.data, 'grades.csv')
+
+def answers(aggregates):
+    return aggregates.query1(), aggregates.query2(), aggregates.query3(), aggregates.query4()
+
+started = time.perf_counter()
+aggregates = Aggregates(args.days).consume(read_submissions(submissions_path), GradeTable.from_csv(grades_path))
+serial_seconds = time.perf_counter() - started
+expected = answers(aggregates)
+
+print(f'{aggregates.rows} submissions, {os.cpu_count()} CPUs')
+print('---------------------------------------------')
+print('   workers |   seconds |  speedup | identical')
+print('---------------------------------------------')
+print("{} | {} | {} | {}".format('serial'.rjust(10), f'{serial_seconds:.2f}'.rjust(9), '1.00x'.rjust(8), 'yes'.rjust(9)))
+for workers in args.workers:
+    started = time.perf_counter()
+    aggregates = aggregate_parallel(submissions_path, grades_path, args.days, workers)
+    seconds = time.perf_counter() - started
+    print("{} | {} | {} | {}".format(str(workers).rjust(10),
+                                     f'{seconds:.2f}'.rjust(9),
+                                     f'{serial_seconds / seconds:.2f}x'.rjust(8),
+                                     ('yes' if answers(aggregates) == expected else 'NO').rjust(9)))
+print('---------------------------------------------')
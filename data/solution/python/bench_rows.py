@@ -0,0 +1,105 @@
+import argparse
+import csv
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+from engine import read_submissions
+from grades import GradeTable
+from rows import SubmissionRows
+
+# --------------------------------------------------------------
+# Memory benchmark of the row representations
+# --------------------------------------------------------------
+# Loads all the submissions of a data directory, joined with their
+# grades, in each representation and prints the bytes per row:
+#
+#   datetime tuples -> the former 6-tuples holding datetime objects for
+#                      the submission time and the submission date
+#   int tuples      -> 6-tuples of ints (day ordinal and epoch seconds)
+#   slots records   -> instances of a __slots__ class of the same ints
+#   array columns   -> array.array columns (see rows.py)
+#
+# Every representation is loaded in a separate process and measured by
+# the growth of its resident set size, so the allocator overhead of the
+# Python objects is included.
+#
+# Usage: python bench_rows.py [--data DIR]
+#   (generate a dataset with: python -m challenge.generate DIR --submissions N)
+# --------------------------------------------------------------
+
+
+class SubmissionRecord:
+    __slots__ = ('submission_id', 'test_id', 'student_id', 'submission_time', 'submission_date', 'grade')
+
+    def __init__(self, submission_id, test_id, student_id, submission_time, submission_date, grade):
+        self.submission_id = submission_id
+        self.test_id = test_id
+        self.student_id = student_id
+        self.submission_time = submission_time
+        self.submission_date = submission_date
+        self.grade = grade
+
+
+def datetime_tuples(path, grades):
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # skip header
+        return [(int(x[0]),
+                 int(x[1]),
+                 int(x[2]),
+                 datetime.strptime(x[3], '%Y-%m-%d %H:%M:%S'),
+                 datetime.strptime(x[3][:10], '%Y-%m-%d'),
+                 grades.get(int(x[0])))
+                for x in reader]
+
+def int_tuples(path, grades):
+    return [row + (grades.get(row[0]),) for row in read_submissions(path)]
+
+def slots_records(path, grades):
+    return [SubmissionRecord(*row, grades.get(row[0])) for row in read_submissions(path)]
+
+def array_columns(path, grades):
+    return SubmissionRows.from_csv(path, grades)
+
+REPRESENTATIONS = {
+    'datetime tuples': datetime_tuples,
+    'int tuples': int_tuples,
+    'slots records': slots_records,
+    'array columns': array_columns,
+}
+
+# Current resident set size in bytes (Linux)
+def current_rss():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--data', default='.', help='directory of submissions.csv and grades.csv')
+parser.add_argument('--measure', choices=REPRESENTATIONS, help=argparse.SUPPRESS)
+args = parser.parse_args()
+
+submissions_path = os.path.join(args.data, 'submissions.csv')
+grades_path = os.path.join(args.data, 'grades.csv')
+
+if args.measure:
+    # Child process: load one representation and print its row count and size
+    grades = GradeTable.from_csv(grades_path)
+    baseline = current_rss()
+    rows = REPRESENTATIONS[args.measure](submissions_path, grades)
+    print(len(rows), current_rss() - baseline)
+    sys.exit()
+
+print('---------------------------------------------------')
+print('representation  |  rows |  bytes/row |   total MB')
+print('---------------------------------------------------')
+for name in REPRESENTATIONS:
+    output = subprocess.run([sys.executable, __file__, '--data', args.data, '--measure', name],
+                            capture_output=True, text=True, check=True).stdout
+    count, size = map(int, output.split())
+    print("{} | {} | {} | {}".format(name.ljust(15),
+                                     f'{count / 1e6:.1f}M'.rjust(5),
+                                     f'{size / max(count, 1):.1f}'.rjust(10),
+                                     f'{size / 2**20:.1f}'.rjust(10)))
+print('---------------------------------------------------')
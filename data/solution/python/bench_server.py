@@ -0,0 +1,127 @@
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+# --------------------------------------------------------------
+# Load test of the query server
+# --------------------------------------------------------------
+# Sends a mix of requests to a running server (see server.py) and
+# compares their latency with running the script once per request:
+#
+#   server (cold)   -> requests whose result was computed (cache misses)
+#   server (cached) -> requests answered from the LRU result cache
+#   script          -> python test.py --days D run in the data directory
+#
+# The requests draw the query, the window length (7, 15 or 30 days), the
+# as-of date (one of the last 10 dates of data) and top_k (1 or 3) at
+# random with a fixed seed, so several requests share their parameters
+# as repeated report jobs do. Every client thread keeps one connection
+# open (keep-alive).
+#
+# Usage: python bench_server.py [--data DIR] [--requests 2000] [--script-requests 10]
+#                               [--concurrency 1] [--script test.py]
+#   (generate a dataset with: python -m challenge.generate DIR --submissions N)
+# --------------------------------------------------------------
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--data', default='.', help='directory of submissions.csv and grades.csv')
+parser.add_argument('--requests', type=int, default=2000, help='number of requests to the server (default 2000)')
+parser.add_argument('--script-requests', type=int, default=10,
+                    help='number of runs of the script (default 10)')
+parser.add_argument('--concurrency', type=int, default=1, help='number of concurrent clients (default 1)')
+parser.add_argument('--script', default=os.path.join(HERE, 'test.py'),
+                    help='script run per request (default: test.py of the Python solution)')
+parser.add_argument('--seed', type=int, default=0)
+args = parser.parse_args()
+
+# Nearest-rank percentile of a sorted list
+def percentile(values, p):
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+def summary(name, latencies):
+    latencies = sorted(latencies)
+    if not latencies:
+        return f'{name.ljust(15)} | {"0".rjust(8)} | {"-".rjust(10)} | {"-".rjust(10)} | {"-".rjust(10)}'
+    return "{} | {} | {} | {} | {}".format(name.ljust(15),
+                                           str(len(latencies)).rjust(8),
+                                           f'{percentile(latencies, 50) * 1000:.2f}'.rjust(10),
+                                           f'{percentile(latencies, 99) * 1000:.2f}'.rjust(10),
+                                           f'{sum(latencies) / len(latencies) * 1000:.2f}'.rjust(10))
+
+# Starts the server on a free port and returns the process and the port
+def start_server():
+    process = subprocess.Popen([sys.executable, os.path.join(HERE, 'server.py'), '--data', args.data, '--port', '0'],
+                               stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line:
+        raise RuntimeError('the server did not start')
+    print(line.strip())
+    return process, int(line.rsplit(':', 1)[1])
+
+def get(connection, target):
+    connection.request('GET', target)
+    response = connection.getresponse()
+    body = response.read()
+    if response.status != 200:
+        raise RuntimeError(f'{target}: {response.status} {body.decode()}')
+    return response.getheader('X-Cache'), body
+
+process, port = start_server()
+try:
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    last_day = date.fromisoformat(json.loads(get(connection, '/stats')[1])['last_day'])
+    connection.close()
+
+    random.seed(args.seed)
+    targets = []
+    for _ in range(args.requests):
+        path = random.choice(['/query1', '/query2', '/query3', '/query4', '/queries'])
+        as_of = last_day - timedelta(days=random.randrange(10))
+        targets.append(f'{path}?days={random.choice([7, 15, 30])}&as_of={as_of}&top_k={random.choice([1, 3])}')
+
+    # Each client sends every concurrency-th request over its own connection
+    def client(offset):
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        latencies = []
+        for target in targets[offset::args.concurrency]:
+            started = time.perf_counter()
+            cached, _ = get(connection, target)
+            latencies.append((cached, time.perf_counter() - started))
+        connection.close()
+        return latencies
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        server_latencies = [x for latencies in executor.map(client, range(args.concurrency)) for x in latencies]
+    server_seconds = time.perf_counter() - started
+finally:
+    process.terminate()
+    process.wait()
+
+script_latencies = []
+for _ in range(args.script_requests):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, args.script, '--days', str(random.choice([7, 15, 30]))],
+                   cwd=args.data, stdout=subprocess.DEVNULL, check=True)
+    script_latencies.append(time.perf_counter() - started)
+
+print('--------------------------------------------------------------------')
+print('mode            | requests |     p50 ms |     p99 ms |    mean ms')
+print('--------------------------------------------------------------------')
+print(summary('server (all)', [latency for _, latency in server_latencies]))
+print(summary('server (cold)', [latency for cached, latency in server_latencies if cached == 'MISS']))
+print(summary('server (cached)', [latency for cached, latency in server_latencies if cached == 'HIT']))
+print(summary('script', script_latencies))
+print('--------------------------------------------------------------------')
+print(f'server throughput: {len(server_latencies) / server_seconds:.0f} requests/s '
+      f'with {args.concurrency} client(s)')
@@ -0,0 +1,177 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from array import array
+from datetime import date
+
+from approximate import SketchAggregates
+from engine import Aggregates
+from sources import load_grades, load_submissions
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from challenge import report
+
+# --------------------------------------------------------------
+# Benchmark of the approximate (sketch) engine
+# --------------------------------------------------------------
+# Answers Queries 1-3 of a data directory with:
+#
+#   python exact   -> the stream engine (see engine.py)
+#   python sketch  -> the sketch engine (see approximate.py)
+#   duckdb exact   -> the duckdb backend (see challenge/backends), if
+#                     DuckDB is installed
+#
+# and prints the time and memory of every engine, the size of the state
+# of Queries 1-3 of the Python engines, and the estimates of the sketch
+# engine next to the exact answers: Queries 1 and 2 with their error
+# bounds, and for Query 3 the number of (date, rank) rows whose student
+# matches and the largest count difference, next to the largest error
+# bound of the counts.
+#
+# Every engine runs in a separate process. Its memory is the growth of
+# the peak resident set size while answering, so all the state and the
+# allocator overhead are included; most of it is the exact state of
+# Query 4, which both Python engines keep. The state of Queries 1-3 is
+# the deep size of the day bitmasks and counters of the stream engine,
+# and of the sketches of the sketch engine. The duckdb time includes
+# building its on-disk database on the first run only (see
+# challenge/backends/duckdb.py).
+#
+# Usage: python bench_sketches.py [--data DIR] [--days N] [--top-k K]
+#   (generate a dataset with: python -m challenge.generate DIR --submissions N --students S)
+#
+# With 2M submissions of 500k students over 30 days (skew 1.1, 15 days,
+# from the CSV files, cold DuckDB database), Python 3.11:
+#
+#   engine        | seconds |  memory MB | Q1-3 state MB
+#   python exact  |    12.5 |      283.9 |          54.8
+#   python sketch |    16.4 |      176.7 |           2.1
+#   duckdb exact  |     4.6 |      366.6 |             -
+#
+#   Query 1: 1421 students (exact), 1404 +/- 390 (sketch)
+#   Query 2: 1164 students (exact), 1049 +/- 316 (sketch)
+#   Query 3: 15 of 15 rows match, largest count difference 0 (bound 62)
+#
+# The exact state holds the day counters of the window only (see
+# engine.py); with those of all 30 days it was 67.1 MB.
+#
+# The aggregation alone (rows already in memory) takes 9.9 s exact and
+# 12.2 s with the sketches: every row updates up to five sketches.
+# --------------------------------------------------------------
+
+ENGINES = ['python exact', 'python sketch', 'duckdb exact']
+
+
+# Peak resident set size in bytes (Linux reports kilobytes)
+def peak_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+# Current resident set size in bytes (Linux)
+def current_rss():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+# Size in bytes of an object and of all the objects it holds (containers,
+# arrays and instances), each object counted once
+def deep_size(obj, seen=None):
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(x, seen) for x in obj)
+    elif not isinstance(obj, (int, float, str, bytes, bytearray, array)) and hasattr(obj, '__dict__'):
+        size += deep_size(vars(obj), seen)
+    return size
+
+# Answers Queries 1-3 with an engine and returns them as JSON values:
+# [value, error] for Queries 1 and 2, [date, student_id, count, error]
+# rows for Query 3 (the errors of the exact engines are 0) and the size
+# of the state of Queries 1-3 (None for duckdb)
+def answer(engine, data_dir, days, top_k):
+    if engine == 'duckdb exact':
+        from challenge import backends
+        results = backends.run('duckdb', data_dir, days, top_k)
+        return ([results.query1, 0], [results.query2, 0],
+                [[day.isoformat(), student_id, count, 0] for day, student_id, count in results.query3],
+                None)
+
+    grades = load_grades(data_dir)
+    aggregates = SketchAggregates(days, top_k) if engine == 'python sketch' else Aggregates(days)
+    aggregates.consume(load_submissions(data_dir), grades)
+    report.check_rows(aggregates.rows)
+    if engine == 'python sketch':
+        return (list(aggregates.query1()), list(aggregates.query2()),
+                [[date.fromordinal(day).isoformat(), student_id, count.value, count.error]
+                 for day, student_id, count in aggregates.query3(top_k)],
+                deep_size(aggregates.days))
+    return ([aggregates.query1(), 0], [aggregates.query2(), 0],
+            [[date.fromordinal(day).isoformat(), student_id, count, 0]
+             for day, student_id, count in aggregates.query3(top_k)],
+            deep_size([aggregates.day_masks, aggregates.valid_day_masks,
+                       aggregates.day_counts, aggregates.day_best]))
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--data', default='.', help='directory of the CSV files')
+parser.add_argument('--days', type=int, default=report.CONSECUTIVE_DAYS)
+parser.add_argument('--top-k', type=int, default=1)
+parser.add_argument('--measure', choices=ENGINES, help=argparse.SUPPRESS)
+args = parser.parse_args()
+
+if args.measure:
+    # Child process: answer the queries with one engine and print the
+    # results, seconds and memory as JSON
+    if args.measure == 'duckdb exact':
+        import duckdb  # noqa: F401 (not part of the measured memory)
+    baseline = current_rss()
+    started = time.perf_counter()
+    query1, query2, query3, state = answer(args.measure, args.data, args.days, args.top_k)
+    print(json.dumps({'seconds': time.perf_counter() - started,
+                      'memory': peak_rss() - baseline,
+                      'state': state,
+                      'query1': query1, 'query2': query2, 'query3': query3}))
+    sys.exit()
+
+results = {}
+print('---------------------------------------------------')
+print('engine        | seconds |  memory MB | Q1-3 state MB')
+print('---------------------------------------------------')
+for engine in ENGINES:
+    process = subprocess.run([sys.executable, __file__, '--data', args.data, '--days', str(args.days),
+                              '--top-k', str(args.top_k), '--measure', engine],
+                             capture_output=True, text=True)
+    if process.returncode != 0:
+        print(f'{engine.ljust(13)} | {"-".rjust(7)} | {"-".rjust(10)} | {"-".rjust(13)}')
+        continue
+    results[engine] = result = json.loads(process.stdout)
+    state = '-' if result['state'] is None else f'{result["state"] / 2**20:.1f}'
+    print("{} | {} | {} | {}".format(engine.ljust(13),
+                                     f'{result["seconds"]:.1f}'.rjust(7),
+                                     f'{result["memory"] / 2**20:.1f}'.rjust(10),
+                                     state.rjust(13)))
+print('---------------------------------------------------')
+
+exact, sketch = results['python exact'], results['python sketch']
+if 'duckdb exact' in results and \
+        [results['duckdb exact'][q] for q in ('query1', 'query2', 'query3')] != \
+        [exact[q] for q in ('query1', 'query2', 'query3')]:
+    print('\nWarning: the exact results of python and duckdb differ')
+
+for number in (1, 2):
+    (value, error), (expected, _) = sketch[f'query{number}'], exact[f'query{number}']
+    print(f'\nQuery {number}: {expected} students (exact), {value} +/- {error} (sketch)'
+          f'{"" if abs(value - expected) <= error else ", out of bounds"}')
+
+# The rows of both engines are ordered by date and rank
+matched = sum(1 for e, s in zip(exact['query3'], sketch['query3']) if e[:2] == s[:2])
+difference = max((abs(e[2] - s[2]) for e, s in zip(exact['query3'], sketch['query3'])), default=0)
+bound = max((s[3] for s in sketch['query3']), default=0)
+print(f'\nQuery 3: {matched} of {len(exact["query3"])} rows match, '
+      f'largest count difference {difference} (bound {bound})')
@@ -0,0 +1,54 @@
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from timeparse import parse_timestamp
+
+# --------------------------------------------------------------
+# Micro-benchmark of the submission_time parsing
+# --------------------------------------------------------------
+# Compares the former two strptime calls per row (full timestamp
+# plus the date prefix) with the fixed-format parser and prints the
+# rows parsed per second by each of them.
+#
+# Usage: python bench_timeparse.py [--rows N] [--days N] [--repeat N]
+# --------------------------------------------------------------
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--rows', type=int, default=1_000_000)
+parser.add_argument('--days', type=int, default=365)
+parser.add_argument('--repeat', type=int, default=3)
+args = parser.parse_args()
+
+random.seed(0)
+start = datetime(2023, 1, 1)
+values = [(start + timedelta(seconds=random.randrange(args.days * 86400))).strftime('%Y-%m-%d %H:%M:%S')
+          for _ in range(args.rows)]
+
+def strptime_twice(values):
+    for x in values:
+        datetime.strptime(x, '%Y-%m-%d %H:%M:%S')
+        datetime.strptime(x[:10], '%Y-%m-%d')
+
+def fixed_format(values):
+    for x in values:
+        parse_timestamp(x)
+
+print(f'{args.rows} timestamps over {args.days} days (best of {args.repeat})')
+print('----------------------------------------')
+print('parser         |     rows/sec | speedup')
+print('----------------------------------------')
+baseline = None
+for name, func in [('strptime x2', strptime_twice), ('fixed format', fixed_format)]:
+    best = float('inf')
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        func(values)
+        best = min(best, time.perf_counter() - started)
+    rate = args.rows / best
+    baseline = baseline or rate
+    print("{} | {} | {}".format(name.ljust(14),
+                                f'{rate:,.0f}'.rjust(12),
+                                f'{rate / baseline:.1f}x'.rjust(7)))
+print('----------------------------------------')
@@ -0,0 +1,59 @@
+# --------------------------------------------------------------
+# Day bitmaps
+# --------------------------------------------------------------
+# Queries 1 and 2 ask whether a student submitted on each of the last
+# N days of data. Instead of collecting the distinct (student, date)
+# pairs, every student keeps a fixed-width bitmask of N bits anchored
+# on the last date the student submitted:
+#
+#   bit i set -> the student submitted on (last date - i)
+#
+# A newer date shifts the mask to the left (the days older than the
+# window fall off) and an older date within the window sets its bit,
+# so the rows can come in any order. A student submitted on every day
+# of the window iff the mask is anchored on the last date of all data
+# and all its N bits are set. The state is O(1) per student whatever
+# the window length (90 or 365 days cost a few more bits only).
+#
+# Two masks of a student are merged by shifting the one anchored on
+# the older date to the newer date and OR-ing them, which makes the
+# masks of separate partitions combinable in any grouping.
+# --------------------------------------------------------------
+
+
+class DayMasks:
+
+    def __init__(self, days):
+        self.days = days
+        self.full = (1 << days) - 1
+        self.masks = {}  # student_id -> [last date, mask]
+
+    def add(self, student_id, day):
+        entry = self.masks.get(student_id)
+        if entry is None:
+            self.masks[student_id] = [day, 1]
+        elif day > entry[0]:
+            shift = day - entry[0]
+            entry[1] = ((entry[1] << shift) | 1) & self.full if shift < self.days else 1
+            entry[0] = day
+        elif entry[0] - day < self.days:
+            entry[1] |= 1 << (entry[0] - day)
+
+    # Merges the masks of another DayMasks of the same width into this one
+    def merge(self, other):
+        for student_id, (day, mask) in other.masks.items():
+            entry = self.masks.get(student_id)
+            if entry is None:
+                self.masks[student_id] = [day, mask]
+                continue
+            if day > entry[0]:
+                entry[0], entry[1], day, mask = day, mask, entry[0], entry[1]
+            shift = entry[0] - day
+            if shift < self.days:
+                entry[1] |= (mask << shift) & self.full
+        return self
+
+    # Number of students with a full mask anchored on the given last date
+    def count_full(self, last_day):
+        full = self.full
+        return sum(1 for day, mask in self.masks.values() if day == last_day and mask == full)
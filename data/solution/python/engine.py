@@ -0,0 +1,253 @@
+import csv
+import heapq
+from collections import Counter
+
+from bitmap import DayMasks
+from timeparse import EPOCH_ORDINAL, parse_timestamp
+
+# --------------------------------------------------------------
+# Streaming engine
+# --------------------------------------------------------------
+# The submissions are read once, row by row, and every row updates
+# the state of all four queries at the same time. Nothing is kept
+# per row, so the memory needed depends on the number of distinct
+# keys only:
+#
+#   day_masks           -> student_id: day bitmask of the window (see bitmap.py)
+#   valid_day_masks     -> student_id: day bitmask of valid submissions (grade > 0)
+#   day_counts          -> submission_date (of the window): Counter(student_id)
+#   day_best            -> submission_date (of the window): (count, student_id) of the top submitter
+#   last_grades         -> (test_id, student_id): (order, grade)
+#   test_totals         -> test_id: [sum, count] of the grades in last_grades
+#
+# The counts of a day only grow, so its top submitter (highest count,
+# lowest student_id on ties) is kept up to date while counting and
+# Query 3 does not have to look at the counters at all. Only the days
+# of the window are counted: the last date only moves forward, so a day
+# that falls out of the window is dropped with its counter (as in
+# approximate.py), and the counters are bounded by the window length
+# whatever the length of the history.
+#
+# Dates are day ordinals and times are epoch seconds (see timeparse.py),
+# so every comparison and window computation works on integers.
+# The state of Query 4 (last_grades and test_totals) is kept by the
+# GradeAggregates base class, which the approximate engine shares (see
+# approximate.py). In last_grades, order is the submission time and id
+# of the grade packed into one int (submission_time << 32 | submission_id,
+# the ids are int32 as in the cache), so the last valid grade is the one
+# with the highest order: on equal times, the highest submission_id wins
+# (see challenge/report.py). order is None as long as no valid grade has
+# been seen for the (test, student) pair (see rule D in Query 4).
+# Every change of a grade in last_grades is applied to the running sum
+# and count of its test, so Query 4 does not have to scan the pairs.
+# --------------------------------------------------------------
+
+# Casts one CSV row of submissions into a typed row:
+#   (submission_id, test_id, student_id, submission_time, submission_date)
+def parse_submission(row):
+    submission_date, submission_time = parse_timestamp(row[3])
+    return (int(row[0]),
+            int(row[1]),
+            int(row[2]),
+            submission_time,
+            submission_date)
+
+# Yields one typed row per submission
+def read_submissions(path):
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # skip header
+        for row in reader:
+            yield parse_submission(row)
+
+# Yields one typed row per submission from the cached submission columns
+# (see challenge/cache.py). The memory-mapped columns are converted to
+# Python ints in chunks, so no CSV parsing is involved at all.
+def read_submissions_cached(columns, chunk_size=1 << 16):
+    for start in range(0, len(columns['submission_id']), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        times = columns['submission_time'][chunk].astype('int64').tolist()
+        yield from zip(columns['submission_id'][chunk].tolist(),
+                       columns['test_id'][chunk].tolist(),
+                       columns['student_id'][chunk].tolist(),
+                       times,
+                       [t // 86400 + EPOCH_ORDINAL for t in times])
+
+
+# State of Query 4: the last valid grade of every (test, student) pair
+# and the running totals of every test
+class GradeAggregates:
+
+    def __init__(self):
+        self.last_grades = {}
+        self.test_totals = {}
+
+    def update_grade(self, submission_id, test_id, student_id, submission_time, grade):
+        key = (test_id, student_id)
+        last = self.last_grades.get(key)
+        if grade > 0:
+            # Keep the last valid grade (the highest submission_id on equal times)
+            order = submission_time << 32 | submission_id
+            if last is None or last[0] is None or order > last[0]:
+                self.last_grades[key] = (order, grade)
+                self._count_grade(test_id, last, grade)
+        elif last is None:
+            self.last_grades[key] = (None, 0)
+            self._count_grade(test_id, None, 0)
+
+    # Applies the change of the grade of a (test, student) pair from last
+    # (None for a new pair) to grade to the running totals of the test
+    def _count_grade(self, test_id, last, grade):
+        totals = self.test_totals.get(test_id)
+        if totals is None:
+            totals = self.test_totals[test_id] = [0, 0]
+        if last is None:
+            totals[0] += grade
+            totals[1] += 1
+        else:
+            totals[0] += grade - last[1]
+
+    # Same rule as in update_grade(): the valid grade with the highest order
+    # wins, so the result does not depend on the order of the partitions
+    def merge_grades(self, other):
+        for key, (order, grade) in other.last_grades.items():
+            last = self.last_grades.get(key)
+            if last is None or (order is not None and (last[0] is None or order > last[0])):
+                self.last_grades[key] = (order, grade)
+                self._count_grade(key[0], last, grade)
+
+    # --------------------
+    # Query 4
+    # --------------------
+    # Each (test, student) pair contributes its last valid grade or, if all
+    # its submissions are invalid, a 0 grade (rule D). The sum and count of
+    # these grades per test are kept while reading (see test_totals), so the
+    # averages are computed from one [sum, count] pair per test. Returns a
+    # list of (test_id, avg_grade) sorted by test_id.
+    def query4(self):
+        return [(test_id, total / count) for test_id, (total, count) in sorted(self.test_totals.items())]
+
+
+class Aggregates(GradeAggregates):
+
+    def __init__(self, consecutive_days):
+        super().__init__()
+        self.consecutive_days = consecutive_days
+        self.rows = 0
+        self.last_date = None
+        self.day_masks = DayMasks(consecutive_days)
+        self.valid_day_masks = DayMasks(consecutive_days)
+        self.day_counts = {}
+        self.day_best = {}
+
+    # Consumes an iterable of submission rows, joining each row with its grade
+    # from a GradeTable (see grades.py).
+    # Note: If a grade does not exist, the default 0 value is assigned.
+    def consume(self, submissions, grades):
+        grade_of = grades.get
+        for submission_id, test_id, student_id, submission_time, submission_date in submissions:
+            self.update(submission_id, test_id, student_id, submission_time, submission_date, grade_of(submission_id))
+        return self
+
+    def update(self, submission_id, test_id, student_id, submission_time, submission_date, grade):
+        self.rows += 1
+        if self.last_date is None or submission_date > self.last_date:
+            self.last_date = submission_date
+            self._evict()
+
+        self.day_masks.add(student_id, submission_date)
+        if grade > 0:
+            self.valid_day_masks.add(student_id, submission_date)
+        counter = self.day_counts.get(submission_date)
+        if counter is None and submission_date > self.last_date - self.consecutive_days:
+            counter = self.day_counts[submission_date] = Counter()
+        if counter is not None:
+            count = counter[student_id] = counter[student_id] + 1
+            best = self.day_best.get(submission_date)
+            if best is None or count > best[0] or (count == best[0] and student_id < best[1]):
+                self.day_best[submission_date] = (count, student_id)
+
+        self.update_grade(submission_id, test_id, student_id, submission_time, grade)
+
+    # Drops the counters of the days that fell out of the window
+    def _evict(self):
+        for day in [day for day in self.day_counts if day <= self.last_date - self.consecutive_days]:
+            del self.day_counts[day]
+            del self.day_best[day]
+
+    # Applies the grade of a submission that was counted with a 0 grade
+    # because its grade was not known yet (see incremental.py). Its day and
+    # submission counts are already right; only a valid grade changes
+    # Query 2 and, if it is the last valid grade of its pair, Query 4.
+    def regrade(self, submission_id, test_id, student_id, submission_time, submission_date, grade):
+        if grade > 0:
+            self.valid_day_masks.add(student_id, submission_date)
+            self.update_grade(submission_id, test_id, student_id, submission_time, grade)
+
+    # Merges the state of another Aggregates into this one. Every part of the
+    # state has an associative and commutative combine function, so partial
+    # aggregates can be merged in any grouping and order.
+    def merge(self, other):
+        self.rows += other.rows
+        if other.last_date is not None and (self.last_date is None or other.last_date > self.last_date):
+            self.last_date = other.last_date
+
+        self.day_masks.merge(other.day_masks)
+        self.valid_day_masks.merge(other.valid_day_masks)
+        for day, counter in other.day_counts.items():
+            if day in self.day_counts:
+                # The counts of both sides add up, so the top submitter is recomputed
+                merged = self.day_counts[day]
+                merged.update(counter)
+                student_id, count = min(merged.items(), key=lambda x: (-x[1], x[0]))
+                self.day_best[day] = (count, student_id)
+            else:
+                self.day_counts[day] = counter
+                self.day_best[day] = other.day_best[day]
+        self._evict()
+
+        self.merge_grades(other)
+        return self
+
+    # Returns the list of the last consecutive_days dates of data available
+    def window(self):
+        return list(range(self.last_date - self.consecutive_days + 1, self.last_date + 1))
+
+    # --------------------
+    # Query 1
+    # --------------------
+    # Students who submitted on every day of the window have a full day
+    # bitmask anchored on the last date (see bitmap.py).
+    def query1(self):
+        return self.day_masks.count_full(self.last_date)
+
+    # --------------------
+    # Query 2
+    # --------------------
+    # Same as Query 1 using the day bitmasks of valid submissions (grade > 0).
+    def query2(self):
+        return self.valid_day_masks.count_full(self.last_date)
+
+    # --------------------
+    # Query 3
+    # --------------------
+    # For each date of the window, select the top_k students with the highest
+    # submission counts (and the lowest student_ids in case of ties).
+    # The top submitter is kept while counting (see day_best); more are
+    # selected with a bounded heap of top_k entries per date, in
+    # O(students log top_k) time instead of sorting all the students.
+    # Returns a list of (submission_date, student_id, count) ordered by date
+    # and rank.
+    def query3(self, top_k=1):
+        result = []
+        for day in self.window():
+            if top_k == 1:
+                if day in self.day_best:
+                    count, student_id = self.day_best[day]
+                    result.append((day, student_id, count))
+                continue
+            counter = self.day_counts.get(day)
+            if counter:
+                for student_id, count in heapq.nsmallest(top_k, counter.items(), key=lambda x: (-x[1], x[0])):
+                    result.append((day, student_id, count))
+        return result
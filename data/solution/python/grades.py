@@ -0,0 +1,96 @@
+import csv
+from array import array
+from bisect import bisect_left
+
+# --------------------------------------------------------------
+# Compact grade table
+# --------------------------------------------------------------
+# A dictionary of grades costs 100+ bytes per grade in Python objects.
+# The grades are therefore streamed from the CSV file into compact
+# columns and then held in one of two layouts:
+#
+#   dense  -> bytearray indexed by (submission_id - smallest id), used
+#             when the ids are dense enough (1 byte per id of the range)
+#   sorted -> array of (submission_id << 8 | grade) sorted by id and
+#             searched by binary search (8 bytes per grade)
+#
+# Grades range from 0 to 100, so they fit in one byte. A submission
+# without a grade gets the default 0 value (in the dense layout the
+# gaps of the range are 0 as well). Every submission has at most one
+# grade.
+# --------------------------------------------------------------
+
+# The dense layout is used if its range is at most this many times the
+# number of grades, i.e. when it costs no more than the sorted layout
+DENSE_SPAN_FACTOR = 8
+
+# Reads the grades CSV into two compact columns: submission ids and grades
+def read_grade_columns(path):
+    ids = array('q')
+    grades = array('B')
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # skip header
+        for row in reader:
+            ids.append(int(row[0]))
+            grades.append(int(row[1]))
+    return ids, grades
+
+
+class GradeTable:
+
+    def __init__(self, dense=None, offset=0, packed=None):
+        self.dense = dense
+        self.offset = offset
+        self.packed = packed
+
+    @classmethod
+    def from_columns(cls, ids, grades):
+        if not ids:
+            return cls(dense=bytearray())
+        smallest = min(ids)
+        span = max(ids) - smallest + 1
+        if span <= DENSE_SPAN_FACTOR * len(ids):
+            dense = bytearray(span)
+            for submission_id, grade in zip(ids, grades):
+                dense[submission_id - smallest] = grade
+            return cls(dense=dense, offset=smallest)
+        return cls(packed=array('q', sorted(submission_id << 8 | grade for submission_id, grade in zip(ids, grades))))
+
+    # Builds the table from the cached grade columns (see challenge/cache.py)
+    # with vectorized operations
+    @classmethod
+    def from_arrays(cls, ids, grades):
+        import numpy as np
+        ids = np.asarray(ids)
+        grades = np.asarray(grades, dtype=np.uint8)
+        if len(ids) == 0:
+            return cls(dense=bytearray())
+        smallest = int(ids.min())
+        span = int(ids.max()) - smallest + 1
+        if span <= DENSE_SPAN_FACTOR * len(ids):
+            # Filled in place through a NumPy view of the bytearray
+            dense = bytearray(span)
+            np.frombuffer(dense, dtype=np.uint8)[ids - smallest] = grades
+            return cls(dense=dense, offset=smallest)
+        return cls(packed=array('q', np.sort(ids.astype(np.int64) << 8 | grades).tobytes()))
+
+    @classmethod
+    def from_csv(cls, path):
+        return cls.from_columns(*read_grade_columns(path))
+
+    # Returns the grade of a submission, or 0 if it has none
+    def get(self, submission_id):
+        if self.dense is not None:
+            index = submission_id - self.offset
+            return self.dense[index] if 0 <= index < len(self.dense) else 0
+        index = bisect_left(self.packed, submission_id << 8)
+        if index < len(self.packed) and self.packed[index] >> 8 == submission_id:
+            return self.packed[index] & 0xFF
+        return 0
+
+    # Number of bytes held by the table
+    def nbytes(self):
+        if self.dense is not None:
+            return len(self.dense)
+        return self.packed.itemsize * len(self.packed)
@@ -0,0 +1,149 @@
+import os
+import pickle
+
+from engine import Aggregates, parse_submission
+
+# --------------------------------------------------------------
+# Incremental (append-only) mode
+# --------------------------------------------------------------
+# The aggregated state of the four queries is persisted to a snapshot
+# file together with a high-water mark for each CSV file. Since the
+# CSV files are append-only, the high-water mark is the byte offset of
+# the first row not ingested yet; submission ids are not ordered in the
+# files, so they cannot be used for that purpose.
+#
+# A refresh only reads the rows appended past the stored offsets:
+#   1. The new grades of submissions ingested without a grade are
+#      applied to the aggregated state (see Aggregates.regrade in
+#      engine.py), the other new grades are added to the pending
+#      grades of the snapshot.
+#   2. The new submissions are joined with the pending grades and
+#      update the aggregated state (see engine.py). A submission
+#      without a pending grade counts with a 0 grade and is kept in
+#      the ungraded submissions until its grade is appended.
+#   3. The ungraded submissions whose grade can no longer change the
+#      results are expired (see expire_ungraded()). The grades still
+#      pending (their submissions were not appended yet) and the other
+#      ungraded submissions are stored with the snapshot for the next
+#      refresh.
+#
+# A late grade only changes Query 2 if its submission is within the
+# window, and Query 4 if the submission is newer than the last valid
+# grade of its (test, student) pair. So the ungraded submissions kept
+# are those of the window, and per pair those after its last valid
+# grade: the snapshot grows with the window and the pairs, not with the
+# rows. The ids of the ingested submissions are kept as a bitmap (1 bit
+# per id, the ids are positive), so a late grade of an expired
+# submission is dropped instead of waiting among the pending grades.
+#
+# Remarks:
+#   - A row is ingested once it is terminated by a newline, so a row
+#     being written while the refresh runs is picked up next time.
+#   - If a CSV file got shorter than its stored offset, it was not
+#     appended to but rewritten, and the snapshot is rebuilt.
+# --------------------------------------------------------------
+
+SNAPSHOT_VERSION = 8
+
+
+class Snapshot:
+
+    def __init__(self, consecutive_days):
+        self.version = SNAPSHOT_VERSION
+        self.aggregates = Aggregates(consecutive_days)
+        self.offsets = {}
+        self.pending_grades = {}
+        self.ungraded = {}  # submission_id: (test_id, student_id, submission_time, submission_date)
+        self.ingested = bytearray()  # bit submission_id set -> ingested
+
+    def is_ingested(self, submission_id):
+        index = submission_id >> 3
+        return index < len(self.ingested) and self.ingested[index] >> (submission_id & 7) & 1
+
+    def mark_ingested(self, submission_id):
+        index = submission_id >> 3
+        if index >= len(self.ingested):
+            self.ingested.extend(bytes(index + 1 - len(self.ingested)))
+        self.ingested[index] |= 1 << (submission_id & 7)
+
+    # Yields the split rows of a CSV file appended past the stored offset
+    # and moves the offset forward as the rows are read.
+    def tail(self, path):
+        offset = self.offsets.get(path, 0)
+        with open(path, 'rb') as f:
+            if offset == 0:
+                header = f.readline()
+                if not header.endswith(b'\n'):
+                    return
+                offset = len(header)
+            else:
+                f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                yield line.decode().rstrip('\r\n').split(',')
+        self.offsets[path] = offset
+
+    # Ingests the rows appended to both CSV files since the last refresh
+    def refresh(self, submissions_path, grades_path):
+        for row in self.tail(grades_path):
+            submission_id, grade = int(row[0]), int(row[1])
+            submission = self.ungraded.pop(submission_id, None)
+            if submission is not None:
+                self.aggregates.regrade(submission_id, *submission, grade)
+            elif not self.is_ingested(submission_id):
+                self.pending_grades[submission_id] = grade
+        # The joined grades are removed from the pending grades, so whatever
+        # remains belongs to submissions not appended yet.
+        # Note: If a grade does not exist (yet), the default 0 value is assigned.
+        for row in self.tail(submissions_path):
+            submission_id, test_id, student_id, submission_time, submission_date = parse_submission(row)
+            grade = self.pending_grades.pop(submission_id, None)
+            if grade is None:
+                self.ungraded[submission_id] = (test_id, student_id, submission_time, submission_date)
+                grade = 0
+            self.mark_ingested(submission_id)
+            self.aggregates.update(submission_id, test_id, student_id, submission_time, submission_date, grade)
+        self.expire_ungraded()
+        return self
+
+    # Forgets the ungraded submissions older than the window whose order
+    # (see engine.py) is below the last valid grade of their pair: the
+    # window only moves forward and that grade is only ever replaced by a
+    # higher one, so their grade can change neither Query 2 nor Query 4
+    def expire_ungraded(self):
+        aggregates = self.aggregates
+        if aggregates.last_date is None:
+            return
+        first_day = aggregates.last_date - aggregates.consecutive_days + 1
+        last_grades = aggregates.last_grades
+        for submission_id, (test_id, student_id, submission_time, submission_date) in list(self.ungraded.items()):
+            if submission_date < first_day:
+                order = last_grades[(test_id, student_id)][0]
+                if order is not None and submission_time << 32 | submission_id < order:
+                    del self.ungraded[submission_id]
+
+    # Returns True if every stored offset is still within its file
+    def is_appendable(self):
+        return all(os.path.getsize(path) >= offset for path, offset in self.offsets.items())
+
+    def save(self, path):
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+
+# Loads the snapshot from the given path, or returns a new one if it does
+# not exist, was written by another version or for another window length,
+# or can no longer be appended to.
+def load_snapshot(path, consecutive_days):
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            snapshot = pickle.load(f)
+        if getattr(snapshot, 'version', None) == SNAPSHOT_VERSION \
+                and snapshot.aggregates.consecutive_days == consecutive_days \
+                and snapshot.is_appendable():
+            return snapshot
+    return Snapshot(consecutive_days)
@@ -0,0 +1,159 @@
+import numpy as np
+
+import csvscan
+from timeparse import EPOCH_ORDINAL
+
+# --------------------------------------------------------------
+# NumPy engine
+# --------------------------------------------------------------
+# The submissions are held as parallel arrays (one per column) and
+# the queries are answered with vectorized operations (np.unique,
+# np.lexsort, np.bincount) instead of Python sets and counters:
+#
+#   submission_id, test_id, student_id -> int32
+#   submission_date                    -> int32 day ordinal
+#   submission_time                    -> int64 epoch seconds
+#   grade                              -> int16 (0 if not graded)
+#
+# The arrays are built from the columns of the columnar cache (see
+# challenge/cache.py) or, without a fresh cache, from the columns the
+# memory-mapped CSV files are tokenized into (see csvscan.py). The
+# queries return the same Python values as the streaming engine (see
+# engine.py), so the report does not depend on the engine.
+# --------------------------------------------------------------
+
+
+class SubmissionArrays:
+
+    def __init__(self, consecutive_days, submission_id, test_id, student_id, submission_time, submission_date, grade):
+        self.consecutive_days = consecutive_days
+        self.submission_id = submission_id
+        self.test_id = test_id
+        self.student_id = student_id
+        self.submission_time = submission_time
+        self.submission_date = submission_date
+        self.grade = grade
+        self.rows = len(submission_id)
+
+    # Builds the arrays from the grade columns (submission_id, grade) and the
+    # submission columns (submission_id, test_id, student_id, submission_time).
+    # The grades are joined on a sorted copy of their submission ids; a missing
+    # grade gets the default 0 value.
+    @classmethod
+    def from_columns(cls, consecutive_days, grades, submissions):
+        submission_id = np.asarray(submissions['submission_id'], dtype=np.int32)
+        submission_time = np.asarray(submissions['submission_time']).astype('datetime64[s]').astype(np.int64)
+
+        order = np.argsort(grades['submission_id'], kind='stable')
+        graded_ids = np.asarray(grades['submission_id'], dtype=np.int32)[order]
+        graded = np.asarray(grades['grade'], dtype=np.int16)[order]
+        grade = np.zeros(len(submission_id), dtype=np.int16)
+        if len(graded_ids):
+            position = np.minimum(np.searchsorted(graded_ids, submission_id), len(graded_ids) - 1)
+            found = graded_ids[position] == submission_id
+            grade[found] = graded[position[found]]
+
+        return cls(consecutive_days,
+                   submission_id,
+                   np.asarray(submissions['test_id'], dtype=np.int32),
+                   np.asarray(submissions['student_id'], dtype=np.int32),
+                   submission_time,
+                   (submission_time // 86400 + EPOCH_ORDINAL).astype(np.int32),
+                   grade)
+
+    # Tokenizes the memory-mapped CSV files into columns (see csvscan.py)
+    @classmethod
+    def from_csv(cls, consecutive_days, grades_path, submissions_path):
+        return cls.from_columns(consecutive_days,
+                                csvscan.read_grade_columns(grades_path),
+                                csvscan.read_submission_columns(submissions_path))
+
+    # Returns the first day ordinal of the last consecutive_days days of data
+    def window_start(self):
+        return int(self.submission_date.max()) - self.consecutive_days + 1
+
+    # Number of students with a (valid) submission on each day of the window.
+    # Every student gets a fixed-width day bitmask (see bitmap.py) made of
+    # 64-bit words: bit (date - window start) is set for each submission and
+    # the students whose mask has all bits set are counted.
+    def _count_every_day(self, valid_only):
+        start = self.window_start()
+        selected = self.submission_date >= start
+        if valid_only:
+            selected &= self.grade > 0
+        students, index = np.unique(self.student_id[selected], return_inverse=True)
+        offset = (self.submission_date[selected] - start).astype(np.uint64)
+
+        words = (self.consecutive_days + 63) // 64
+        masks = np.zeros((len(students), words), dtype=np.uint64)
+        np.bitwise_or.at(masks, (index, offset // 64), np.left_shift(np.uint64(1), offset % 64))
+        full = np.full(words, np.iinfo(np.uint64).max, dtype=np.uint64)
+        full[-1] = (1 << (self.consecutive_days - 64 * (words - 1))) - 1
+        return int(np.count_nonzero((masks == full).all(axis=1)))
+
+    # --------------------
+    # Query 1
+    # --------------------
+    def query1(self):
+        return self._count_every_day(valid_only=False)
+
+    # --------------------
+    # Query 2
+    # --------------------
+    def query2(self):
+        return self._count_every_day(valid_only=True)
+
+    # --------------------
+    # Query 3
+    # --------------------
+    # Counts the rows per (submission_date, student_id) key and ranks the keys
+    # of each date by one int64 rank key (-count << 32) + student_id, which is
+    # smallest for the highest count and, on ties, the lowest student_id. The
+    # top student of each date is its smallest rank key (minimum.reduceat over
+    # the keys, which np.unique returns grouped by date); the top_k students
+    # are selected with argpartition per date, so only top_k keys are sorted.
+    # Returns a list of (submission_date, student_id, count) ordered by date
+    # and rank.
+    def query3(self, top_k=1):
+        start = self.window_start()
+        selected = self.submission_date >= start
+        keys, counts = np.unique((self.submission_date[selected].astype(np.int64) - start) << 32
+                                 | self.student_id[selected].astype(np.int64),
+                                 return_counts=True)
+        if len(keys) == 0:
+            return []
+        days = keys >> 32
+        ranks = (keys & 0xFFFFFFFF) - (counts.astype(np.int64) << 32)
+        bounds = np.flatnonzero(days[1:] != days[:-1]) + 1
+        starts = np.concatenate(([0], bounds))
+        if top_k == 1:
+            top = np.minimum.reduceat(ranks, starts)
+            return [(int(day) + start, int(rank & 0xFFFFFFFF), int(-(rank >> 32)))
+                    for day, rank in zip(days[starts], top)]
+        result = []
+        for first, end in zip(starts, np.concatenate((bounds, [len(keys)]))):
+            day_ranks = ranks[first:end]
+            if len(day_ranks) > top_k:
+                day_ranks = day_ranks[np.argpartition(day_ranks, top_k - 1)[:top_k]]
+            result.extend((int(days[first]) + start, int(rank & 0xFFFFFFFF), int(-(rank >> 32)))
+                          for rank in np.sort(day_ranks))
+        return result
+
+    # --------------------
+    # Query 4
+    # --------------------
+    # Sorts the submissions by (test_id, student_id), validity, time and
+    # submission_id, so that the last row of each (test, student) key is its
+    # last valid submission (the highest submission_id on equal times) or, if
+    # all its submissions are invalid, one with a 0 grade (rule D). The selected
+    # grades are then averaged per test with bincount.
+    def query4(self):
+        keys = self.test_id.astype(np.int64) << 32 | self.student_id.astype(np.int64)
+        order = np.lexsort((self.submission_id, self.submission_time, self.grade > 0, keys))
+        keys = keys[order]
+        last = np.ones(len(keys), dtype=bool)
+        last[:-1] = keys[1:] != keys[:-1]
+        tests, position = np.unique(keys[last] >> 32, return_inverse=True)
+        totals = np.bincount(position, weights=self.grade[order][last])
+        counts = np.bincount(position)
+        return [(int(test_id), float(total) / int(count)) for test_id, total, count in zip(tests, totals, counts)]
@@ -0,0 +1,84 @@
+import multiprocessing
+import os
+
+from engine import Aggregates, parse_submission
+from grades import GradeTable
+
+# --------------------------------------------------------------
+# Parallel mode
+# --------------------------------------------------------------
+# The submissions CSV is split into byte ranges aligned on line
+# boundaries, one per chunk. Every worker process parses its chunks
+# and builds partial aggregates (see engine.py), which the parent
+# merges in the order of the chunks. Since every part of the state
+# has an associative combine function and the order of the chunks is
+# kept, the result is identical to the serial mode.
+#
+# The aggregates are built by a factory of consecutive_days, Aggregates
+# by default; the approximate engine passes its SketchAggregates, whose
+# sketches merge the same way (see approximate.py).
+#
+# The grades are read by the parent and inherited by the forked workers.
+# The fork start method is required: the solution is a script and the
+# other start methods would run it again in every worker.
+# --------------------------------------------------------------
+
+# Grades of the running aggregation, inherited by the workers
+_grades = None
+
+# Returns the byte ranges of the rows of a CSV file (after its header),
+# split into about the given number of chunks aligned on line boundaries
+def split_ranges(path, chunks):
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        f.readline()  # skip header
+        bounds = [f.tell()]
+        step = max((size - bounds[0]) // chunks, 1)
+        while bounds[-1] < size:
+            # Move to the end of the line that contains the last byte of the chunk
+            f.seek(min(bounds[-1] + step, size) - 1)
+            f.readline()
+            bounds.append(min(f.tell(), size))
+    return list(zip(bounds[:-1], bounds[1:]))
+
+# Yields the split rows of a CSV file within a byte range
+def read_range(path, start, end):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        for line in f:
+            if remaining <= 0:
+                break
+            remaining -= len(line)
+            yield line.decode().rstrip('\r\n').split(',')
+
+# Builds the partial aggregates of the rows within a byte range
+def aggregate_range(path, start, end, consecutive_days, factory):
+    aggregates = factory(consecutive_days)
+    for row in read_range(path, start, end):
+        submission_id, test_id, student_id, submission_time, submission_date = parse_submission(row)
+        aggregates.update(submission_id, test_id, student_id, submission_time, submission_date,
+                          _grades.get(submission_id))
+    return aggregates
+
+# Aggregates the submissions with the given number of worker processes
+def aggregate_parallel(submissions_path, grades_path, consecutive_days, workers, chunks_per_worker=4,
+                       factory=Aggregates):
+    global _grades
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        raise Exception('The parallel mode requires the fork start method, which is not available on this platform.')
+
+    _grades = GradeTable.from_csv(grades_path)
+    ranges = split_ranges(submissions_path, workers * chunks_per_worker)
+    try:
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            partials = pool.starmap(aggregate_range,
+                                    [(submissions_path, start, end, consecutive_days, factory)
+                                     for start, end in ranges])
+    finally:
+        _grades = None
+
+    aggregates = factory(consecutive_days)
+    for partial in partials:
+        aggregates.merge(partial)
+    return aggregates
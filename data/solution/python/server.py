@@ -0,0 +1,343 @@
+import argparse
+import asyncio
+import heapq
+import json
+import os
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from urllib.parse import parse_qs, urlsplit
+
+from engine import GradeAggregates
+from rows import SubmissionRows
+from sliding import DailyAggregates
+from sources import load_grades, load_submissions, signature
+from timeparse import format_day
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from challenge import report
+
+# --------------------------------------------------------------
+# Resident query server
+# --------------------------------------------------------------
+# test.py pays the interpreter startup, the imports and the load of
+# the CSV files on every run. The server loads the dataset once and
+# answers the four queries over HTTP (on a TCP port or a Unix socket):
+#
+#   GET /query1?days=15&as_of=2023-12-31
+#   GET /query2?days=15&as_of=2023-12-31
+#   GET /query3?days=15&as_of=2023-12-31&top_k=1
+#   GET /query4?as_of=2023-12-31
+#   GET /queries?days=15&as_of=2023-12-31&top_k=1   (all four)
+#   GET /stats
+#
+# as_of is the last day of the window of Queries 1-3 and of the
+# submissions taken into account by Query 4 (default: the last date of
+# data); days and top_k default to report.CONSECUTIVE_DAYS and 1 as in
+# test.py. The results are JSON documents with the same values as the
+# report of test.py. A window that reaches beyond the dates of data is
+# answered as the equivalent window next to them (see parse_params()),
+# which is the one echoed in the result, so the work of a request is
+# bounded by the days of data whatever its parameters.
+#
+# The dataset is held as:
+#
+#   daily          -> the per-day aggregates of the daily report (see
+#                     sliding.py), so Queries 1-3 of any window only look
+#                     at the days of the window
+#   query4_by_day  -> the result of Query 4 as of every date of data,
+#                     computed once while loading
+#
+# The JSON bodies are kept in an LRU cache keyed by the query and its
+# normalized parameters. Before every request the (mtime, size) of the
+# CSV files is compared with the one of the loaded dataset: on a change
+# the dataset is loaded again and the cache is cleared. The query
+# requests wait for the new dataset, so no result of the former CSV
+# files is served once a change was seen. Loading and computing run on
+# one worker thread, so the event loop is not blocked meanwhile (/stats
+# keeps answering) and the dataset is never used while being replaced.
+#
+# Usage: python server.py [--data DIR] [--port 8000 | --unix PATH] [--cache-size 256]
+#   (load test: python bench_server.py, see there)
+# --------------------------------------------------------------
+
+class Dataset:
+
+    def __init__(self, source_dir):
+        # Taken before reading, so a change during the load triggers another one
+        self.signature = signature(source_dir)
+        started = time.perf_counter()
+        rows = SubmissionRows.from_submissions(load_submissions(source_dir), load_grades(source_dir))
+        report.check_rows(len(rows))
+        self.rows = len(rows)
+
+        self.daily = DailyAggregates()
+        day_rows = {}  # submission_date -> indexes of its rows, in file order
+        update = self.daily.update
+        for index, (_, _, student_id, _, submission_date, grade) in enumerate(rows):
+            update(student_id, submission_date, grade)
+            indexes = day_rows.get(submission_date)
+            if indexes is None:
+                indexes = day_rows[submission_date] = array('i')
+            indexes.append(index)
+        self.last_day = self.daily.last_day()
+
+        # Query 4 as of every date of data: the rows are applied date by date
+        # and the averages are taken after each date. The last valid grade of
+        # a pair does not depend on the order of the rows (see engine.py), so
+        # every result is the one of a single pass over the rows up to that date.
+        self.days = sorted(day_rows)
+        self.query4_by_day = []
+        grades = GradeAggregates()
+        update = grades.update_grade
+        for day in self.days:
+            for index in day_rows[day]:
+                update(rows.submission_id[index], rows.test_id[index], rows.student_id[index],
+                       rows.submission_time[index], rows.grade[index])
+            self.query4_by_day.append(grades.query4())
+        self.load_seconds = time.perf_counter() - started
+
+    # Queries 1 and 2 of the window of days ending on as_of
+    def query12(self, days, as_of):
+        _, result1, result2, _ = next(self.daily.reports(as_of, as_of, days))
+        return result1, result2
+
+    # Same as Aggregates.query3() for the window of days ending on as_of,
+    # walking the dates of data within the window only
+    def query3(self, days, as_of, top_k):
+        result = []
+        for day in self.days[bisect_left(self.days, as_of - days + 1):bisect_right(self.days, as_of)]:
+            counter = self.daily.day_counts[day]
+            for student_id, count in heapq.nsmallest(top_k, counter.items(), key=lambda x: (-x[1], x[0])):
+                result.append((day, student_id, count))
+        return result
+
+    # Same as Aggregates.query4() for the submissions up to as_of
+    def query4(self, as_of):
+        position = bisect_right(self.days, as_of)
+        return self.query4_by_day[position - 1] if position else []
+
+
+class ResultCache:
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        body = self.entries.get(key)
+        if body is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return body
+
+    def put(self, key, body):
+        self.entries[key] = body
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+
+class BadRequest(Exception):
+    pass
+
+
+# Parses the parameters of a query, given as a dict of lists (see parse_qs).
+# A window beyond the dates of data (first_day to last_day) is moved to the
+# equivalent one next to them: it has a day without data, so Queries 1 and 2
+# are 0, Query 3 lists the same dates of data and Query 4 is the same. The
+# window then has at most the days of data and 2 more.
+def parse_params(query, first_day, last_day):
+    def value(name, cast, default):
+        values = query.get(name)
+        if not values:
+            return default
+        try:
+            return cast(values[-1])
+        except ValueError:
+            raise BadRequest(f'invalid {name}: {values[-1]!r}')
+
+    days = value('days', int, report.CONSECUTIVE_DAYS)
+    top_k = value('top_k', int, 1)
+    as_of = value('as_of', lambda x: date.fromisoformat(x).toordinal(), last_day)
+    if days < 1 or top_k < 1:
+        raise BadRequest('days and top_k must be at least 1')
+    if as_of > last_day + 1:
+        days = max(days - (as_of - last_day - 1), 1)
+        as_of = last_day + 1
+    elif as_of < first_day - 1:
+        days, as_of = 1, first_day - 1
+    days = min(days, as_of - first_day + 2)
+    return days, as_of, top_k
+
+
+class QueryServer:
+
+    ROUTES = ('/query1', '/query2', '/query3', '/query4', '/queries')
+
+    def __init__(self, source_dir, cache_size):
+        self.source_dir = source_dir
+        self.cache = ResultCache(cache_size)
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.lock = asyncio.Lock()
+        self.dataset = None
+        self.generation = 0
+        self.reloads = 0
+        self.requests = 0
+        self.started = time.time()
+
+    async def run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    # Returns the loaded dataset, loading it again if the CSV files changed
+    async def current_dataset(self):
+        if self.dataset is None or signature(self.source_dir) != self.dataset.signature:
+            async with self.lock:
+                if self.dataset is None or signature(self.source_dir) != self.dataset.signature:
+                    reload = self.dataset is not None
+                    self.dataset = await self.run(Dataset, self.source_dir)
+                    self.generation += 1
+                    self.reloads += reload
+                    self.cache.clear()
+        return self.dataset
+
+    def compute(self, dataset, route, days, as_of, top_k):
+        window = {'days': days, 'as_of': format_day(as_of)}
+        results = {}
+        if route in ('/query1', '/query2', '/queries'):
+            results['query1'], results['query2'] = dataset.query12(days, as_of)
+        if route in ('/query3', '/queries'):
+            results['query3'] = [{'submission_date': format_day(day), 'student_id': student_id, 'count': count}
+                                 for day, student_id, count in dataset.query3(days, as_of, top_k)]
+            window['top_k'] = top_k
+        if route in ('/query4', '/queries'):
+            results['query4'] = [{'test_id': test_id, 'avg_grade': avg_grade}
+                                 for test_id, avg_grade in dataset.query4(as_of)]
+        if route != '/queries':
+            results = {'result': results[route[1:]]}
+        if route == '/query4':
+            window = {'as_of': window['as_of']}
+        return json.dumps({**window, **results}).encode()
+
+    # Returns (status, body, cache status) of a GET request
+    async def respond(self, target):
+        url = urlsplit(target)
+        if url.path == '/stats':
+            return 200, json.dumps(self.stats()).encode(), None
+        if url.path not in self.ROUTES:
+            return 404, json.dumps({'error': f'unknown path {url.path}'}).encode(), None
+
+        dataset = await self.current_dataset()
+        try:
+            days, as_of, top_k = parse_params(parse_qs(url.query), dataset.days[0], dataset.last_day)
+        except BadRequest as e:
+            return 400, json.dumps({'error': str(e)}).encode(), None
+        # Only the parameters a query depends on are part of its key
+        key = (self.generation, url.path,
+               None if url.path == '/query4' else days,
+               as_of,
+               top_k if url.path in ('/query3', '/queries') else None)
+        body = self.cache.get(key)
+        if body is not None:
+            return 200, body, 'HIT'
+        body = await self.run(self.compute, dataset, url.path, days, as_of, top_k)
+        self.cache.put(key, body)
+        return 200, body, 'MISS'
+
+    def stats(self):
+        dataset = self.dataset
+        return {'rows': dataset.rows if dataset else 0,
+                'last_day': format_day(dataset.last_day) if dataset else None,
+                'load_seconds': round(dataset.load_seconds, 3) if dataset else None,
+                'reloads': self.reloads,
+                'requests': self.requests,
+                'uptime_seconds': round(time.time() - self.started, 3),
+                'cache': {'entries': len(self.cache.entries), 'size': self.cache.size,
+                          'hits': self.cache.hits, 'misses': self.cache.misses}}
+
+    # Serves the HTTP/1.1 requests of a connection (keep-alive by default)
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                if int(headers.get('content-length', 0)):
+                    await reader.readexactly(int(headers['content-length']))
+
+                parts = request_line.decode('latin-1').split()
+                keep_alive = len(parts) == 3 and parts[2] == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                self.requests += 1
+                if len(parts) != 3:
+                    status, body, cached = 400, json.dumps({'error': 'malformed request line'}).encode(), None
+                elif parts[0] != 'GET':
+                    status, body, cached = 405, json.dumps({'error': 'only GET is supported'}).encode(), None
+                else:
+                    try:
+                        status, body, cached = await self.respond(parts[1])
+                    except Exception as e:
+                        status, body, cached = 500, json.dumps({'error': f'{type(e).__name__}: {e}'}).encode(), None
+
+                head = [f'HTTP/1.1 {status} {REASONS[status]}',
+                        'Content-Type: application/json',
+                        f'Content-Length: {len(body)}',
+                        'Connection: ' + ('keep-alive' if keep_alive else 'close')]
+                if cached:
+                    head.append(f'X-Cache: {cached}')
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass  # the client went away or sent an oversized or malformed request
+        finally:
+            writer.close()
+
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+async def main(args):
+    server = QueryServer(args.data, args.cache_size)
+    dataset = await server.current_dataset()
+    if args.unix:
+        listener = await asyncio.start_unix_server(server.handle, path=args.unix)
+        address = args.unix
+    else:
+        listener = await asyncio.start_server(server.handle, args.host, args.port)
+        address = f'http://{args.host}:{listener.sockets[0].getsockname()[1]}'
+    print(f'Loaded {dataset.rows} submissions in {dataset.load_seconds:.2f}s, serving on {address}', flush=True)
+    async with listener:
+        await listener.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', default='.', help='directory of submissions.csv and grades.csv')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000, help='TCP port (0 picks a free one)')
+    parser.add_argument('--unix', metavar='PATH', help='serve on this Unix socket instead of a TCP port')
+    parser.add_argument('--cache-size', type=int, default=256, help='number of cached results (default 256)')
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,215 @@
+import math
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+# --------------------------------------------------------------
+# Mergeable sketches
+# --------------------------------------------------------------
+# Fixed-size summaries of a stream of student_ids, whose memory does
+# not depend on the number of distinct students:
+#
+#   HyperLogLog  -> number of distinct ids, with a relative standard
+#                   error of 1.04 / sqrt(2^precision)
+#   BottomK      -> the k smallest hashes of the ids (k minimum values),
+#                   which estimate the size of unions and intersections
+#                   of several streams (see intersection())
+#   CountMin     -> number of occurrences of an id, overestimated by at
+#                   most e / width * total with probability
+#                   1 - e^-depth (with conservative updates)
+#   HeavyHitters -> a CountMin and the ids with the highest estimated
+#                   counts (the candidate top submitters)
+#
+# Every id is hashed once into 64 bits (hash64) and the hash is passed
+# to all the sketches. Two sketches of the same parameters built from
+# separate streams merge into a sketch of the combined stream: the
+# HyperLogLog registers take their maximum and the BottomK hashes their
+# k smallest, which is exactly the sketch of a single pass. The CountMin
+# counters add up, which keeps them within the error bound of the
+# combined total, but without the benefit of the conservative updates
+# across the partitions (the merged counts are a bit higher than those
+# of a single pass). The candidates of HeavyHitters are the union of
+# both sides, re-ranked by the merged counters.
+#
+# Estimates come with the half-width of their error interval (about 95%
+# for HyperLogLog and BottomK, 1 - e^-depth for CountMin).
+# --------------------------------------------------------------
+
+MASK64 = (1 << 64) - 1
+
+Estimate = namedtuple('Estimate', ['value', 'error'])
+
+
+# splitmix64 finalizer: a fast, well mixed 64-bit hash of an int
+def hash64(x):
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+class HyperLogLog:
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+        self._bits = 64 - precision
+        self._mask = (1 << self._bits) - 1
+
+    # The first precision bits select the register, which keeps the
+    # highest rank (position of the first 1 bit) of the remaining bits
+    def add(self, h):
+        rank = self._bits - (h & self._mask).bit_length() + 1
+        index = h >> self._bits
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    # Raw estimate with the linear counting correction of small cardinalities
+    def count(self):
+        m = len(self.registers)
+        raw = 0.7213 / (1 + 1.079 / m) * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            raw = m * math.log(m / zeros)
+        return Estimate(round(raw), round(2 * 1.04 / math.sqrt(m) * raw))
+
+
+class BottomK:
+
+    def __init__(self, k=4096):
+        self.k = k
+        self.hashes = array('Q')  # sorted, distinct
+        self.threshold = MASK64 + 1  # hashes above the k-th smallest are ignored
+
+    def add(self, h):
+        if h >= self.threshold:
+            return
+        hashes = self.hashes
+        i = bisect_left(hashes, h)
+        if i < len(hashes) and hashes[i] == h:
+            return
+        hashes.insert(i, h)
+        if len(hashes) > self.k:
+            hashes.pop()
+        if len(hashes) == self.k:
+            self.threshold = hashes[-1]
+
+    def merge(self, other):
+        self.hashes = array('Q', sorted(set(self.hashes).union(other.hashes))[:self.k])
+        self.threshold = self.hashes[-1] if len(self.hashes) == self.k else MASK64 + 1
+        return self
+
+    # Exact below k distinct ids, otherwise estimated from the k-th
+    # smallest hash with a relative standard error of 1 / sqrt(k - 2)
+    def count(self):
+        if len(self.hashes) < self.k:
+            return Estimate(len(self.hashes), 0)
+        value = (self.k - 1) * (MASK64 + 1) / self.threshold
+        return Estimate(round(value), round(2 * value / math.sqrt(self.k - 2)))
+
+
+# Number of ids present in every sketch (the intersection of their streams).
+# The k smallest hashes of the union are a uniform sample of the union, and
+# a hash of the sample present in a stream is among the k smallest of that
+# stream, so the fraction of the sample found in every sketch estimates the
+# share of the intersection in the union. The result is exact as long as the
+# union has fewer than k distinct ids.
+def intersection(sketches):
+    union = BottomK(sketches[0].k)
+    for sketch in sketches:
+        union.merge(sketch)
+    members = [set(sketch.hashes) for sketch in sketches]
+    found = sum(1 for h in union.hashes if all(h in m for m in members))
+    size = union.count()
+    if not size.error:
+        return Estimate(found, 0)
+    share = found / len(union.hashes)
+    # Binomial error of the sampled share (at least one hit, so that an
+    # empty sample still has a bound) combined with the error of the union
+    sample_error = 2 * size.value * math.sqrt(max(found, 1) * (1 - share)) / len(union.hashes)
+    return Estimate(round(share * size.value), round(math.hypot(sample_error, share * size.error)))
+
+
+class CountMin:
+
+    def __init__(self, width=4096, depth=4):
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self.counters = array('I', bytes(4 * width * depth))
+        self._rows = [(i, i * width) for i in range(depth)]
+
+    # Row i uses the column (h1 + i * h2) mod width of the two halves of
+    # the hash (double hashing)
+    def _columns(self, h):
+        h1, h2, width = h & 0xFFFFFFFF, (h >> 32) | 1, self.width
+        return [offset + (h1 + i * h2) % width for i, offset in self._rows]
+
+    # Counts one occurrence and returns the new estimated count. Only the
+    # counters below the new estimate are raised (conservative update): they
+    # still never undercount, but overcount much less than when all of them
+    # are incremented.
+    def add(self, h):
+        self.total += 1
+        counters = self.counters
+        columns = self._columns(h)
+        counts = [counters[column] for column in columns]
+        estimate = min(counts) + 1
+        for column, count in zip(columns, counts):
+            if count < estimate:
+                counters[column] = estimate
+        return estimate
+
+    def count(self, h):
+        return min(self.counters[column] for column in self._columns(h))
+
+    def merge(self, other):
+        self.total += other.total
+        self.counters = array('I', map(sum, zip(self.counters, other.counters)))
+        return self
+
+    # The estimates never undercount and overcount by at most this much
+    # with probability 1 - e^-depth
+    def error(self):
+        return math.ceil(math.e / self.width * self.total)
+
+
+class HeavyHitters:
+
+    def __init__(self, capacity=8, width=4096, depth=4):
+        self.capacity = capacity
+        self.counts = CountMin(width, depth)
+        self.candidates = {}  # student_id -> estimated count when last seen
+        self.floor = 0  # lowest count of the candidates (a lower bound of it)
+
+    # An id becomes a candidate if its estimated count beats the lowest
+    # candidate (the higher student_id on equal counts)
+    def add(self, student_id, h):
+        count = self.counts.add(h)
+        candidates = self.candidates
+        if student_id in candidates or len(candidates) < self.capacity:
+            candidates[student_id] = count
+        elif count >= self.floor:
+            lowest, lowest_count = min(candidates.items(), key=lambda x: (x[1], -x[0]))
+            if (count, -student_id) > (lowest_count, -lowest):
+                del candidates[lowest]
+                candidates[student_id] = count
+                self.floor = min(candidates.values())
+            else:
+                self.floor = lowest_count
+
+    def merge(self, other):
+        self.counts.merge(other.counts)
+        self.candidates = dict(self.top(self.capacity, set(self.candidates).union(other.candidates)))
+        self.floor = min(self.candidates.values(), default=0)
+        return self
+
+    # The top_k (student_id, estimated count) by count, then student_id
+    def top(self, top_k, students=None):
+        ranked = [(student_id, self.counts.count(hash64(student_id)))
+                  for student_id in (self.candidates if students is None else students)]
+        return sorted(ranked, key=lambda x: (-x[1], x[0]))[:top_k]
@@ -0,0 +1,105 @@
+from collections import Counter
+
+# --------------------------------------------------------------
+# Sliding-window daily report
+# --------------------------------------------------------------
+# Queries 1 to 3 are anchored on the last date of data. To answer them
+# "as of" every date of a range, the submissions are aggregated once
+# per day:
+#
+#   day_counts      -> submission_date: Counter(student_id), i.e. the
+#                      distinct submitters of the day and the top one
+#   valid_students  -> submission_date: set of the students with a
+#                      valid submission (grade > 0) that day
+#
+# The windows of consecutive end dates differ by two days only, so
+# each window is derived from the previous one: the new end date is
+# added and the date that falls out of the window is evicted. For each
+# student the window keeps the number of its days within the window,
+# and the number of students with all days (Queries 1 and 2) changes
+# only when such a count reaches or leaves the window length. A whole
+# range of reports thus costs one pass over the daily submitters.
+#
+# Query 3 of the window ending on a date is the top submitter of each
+# of its days, so every report only lists the top submitter of its
+# end date; the rows of the previous days are the previous reports.
+# --------------------------------------------------------------
+
+
+# Number of students with a submission on every day of a sliding window
+class SlidingWindow:
+
+    def __init__(self, days):
+        self.days = days
+        self.day_counts = {}  # student_id -> number of days in the window
+        self.full = 0
+
+    def add(self, students):
+        for student_id in students:
+            count = self.day_counts.get(student_id, 0) + 1
+            self.day_counts[student_id] = count
+            if count == self.days:
+                self.full += 1
+
+    def evict(self, students):
+        for student_id in students:
+            count = self.day_counts[student_id]
+            if count == self.days:
+                self.full -= 1
+            if count == 1:
+                del self.day_counts[student_id]
+            else:
+                self.day_counts[student_id] = count - 1
+
+
+class DailyAggregates:
+
+    def __init__(self):
+        self.rows = 0
+        self.day_counts = {}
+        self.valid_students = {}
+
+    # Consumes an iterable of submission rows, joining each row with its grade
+    # from a GradeTable (see grades.py); a missing grade counts as 0
+    def consume(self, submissions, grades):
+        grade_of = grades.get
+        for submission_id, _, student_id, _, submission_date in submissions:
+            self.update(student_id, submission_date, grade_of(submission_id))
+        return self
+
+    def update(self, student_id, submission_date, grade):
+        self.rows += 1
+        counter = self.day_counts.get(submission_date)
+        if counter is None:
+            counter = self.day_counts[submission_date] = Counter()
+        counter[student_id] += 1
+        if grade > 0:
+            valid = self.valid_students.get(submission_date)
+            if valid is None:
+                valid = self.valid_students[submission_date] = set()
+            valid.add(student_id)
+
+    def last_day(self):
+        return max(self.day_counts)
+
+    # Yields the report of every end date from first_day to last_day:
+    # (end date, result #1, result #2, (student_id, count) of the top
+    # submitter of the end date or None if nobody submitted that day)
+    def reports(self, first_day, last_day, consecutive_days):
+        submitted = SlidingWindow(consecutive_days)
+        submitted_valid = SlidingWindow(consecutive_days)
+        # Only the dates of data before first_day count, however long the window
+        for day in sorted(day for day in self.day_counts if first_day - consecutive_days < day < first_day):
+            submitted.add(self.day_counts[day])
+            submitted_valid.add(self.valid_students.get(day, ()))
+
+        for day in range(first_day, last_day + 1):
+            counter = self.day_counts.get(day, {})
+            submitted.add(counter)
+            submitted_valid.add(self.valid_students.get(day, ()))
+            if day > first_day:
+                evicted = day - consecutive_days
+                submitted.evict(self.day_counts.get(evicted, ()))
+                submitted_valid.evict(self.valid_students.get(evicted, ()))
+            top = min(counter.items(), key=lambda x: (-x[1], x[0])) if counter else None
+            yield day, submitted.full, submitted_valid.full, top
@@ -0,0 +1,54 @@
+import os
+import sys
+
+from engine import read_submissions, read_submissions_cached
+from grades import GradeTable
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from challenge import cache
+
+# --------------------------------------------------------------
+# Input of the stream engine
+# --------------------------------------------------------------
+# Grades and submissions are read from the first available source:
+#
+#   1. the memory-mapped columns of the cache, if it is fresh
+#      (see challenge/cache.py)
+#   2. the columns tokenized from the memory-mapped CSV files, if NumPy
+#      is installed (see csvscan.py)
+#   3. the rows parsed by the csv module
+#
+# NumPy is only imported when a source is read, so the modes that do
+# not read any (e.g. an incremental refresh) do not pay for its import.
+# --------------------------------------------------------------
+
+
+# The memory-mapped CSV tokenizer requires NumPy (see csvscan.py)
+def _csvscan():
+    try:
+        import csvscan
+    except ImportError:
+        return None
+    return csvscan
+
+def load_grades(source_dir='.'):
+    columns = cache.load_arrays(source_dir, 'grades')
+    csvscan = _csvscan()
+    if columns is None and csvscan:
+        columns = csvscan.read_grade_columns(os.path.join(source_dir, 'grades.csv'))
+    return GradeTable.from_arrays(columns['submission_id'], columns['grade']) if columns \
+        else GradeTable.from_csv(os.path.join(source_dir, 'grades.csv'))
+
+# Yields one typed row per submission (see engine.py)
+def load_submissions(source_dir='.'):
+    columns = cache.load_arrays(source_dir, 'submissions')
+    if columns:
+        return read_submissions_cached(columns)
+    path = os.path.join(source_dir, 'submissions.csv')
+    csvscan = _csvscan()
+    return csvscan.read_submissions(path) if csvscan else read_submissions(path)
+
+# (mtime, size) of the CSV files read by the engine, to detect their changes
+def signature(source_dir='.'):
+    stats = [os.stat(os.path.join(source_dir, name)) for name in ('grades.csv', 'submissions.csv')]
+    return tuple((stat.st_mtime_ns, stat.st_size) for stat in stats)
@@ -1,186 +1,184 @@
-import csv
-from datetime import datetime, timedelta
-from collections import Counter
-import itertools
+import argparse
+import os
+import sys
+from datetime import date
+from functools import partial
+
+from approximate import SketchAggregates
+from engine import Aggregates
+from incremental import Snapshot, load_snapshot
+from sources import load_grades, load_submissions
+from timeparse import format_day
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from challenge import cache, profiling, report
+from challenge.backends.python import answer
 
 # Param
-CONSECUTIVE_DAYS = 15
+CONSECUTIVE_DAYS = report.CONSECUTIVE_DAYS
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--days', type=int, default=CONSECUTIVE_DAYS,
+                    help=f'number of consecutive days of the window (default {CONSECUTIVE_DAYS})')
+parser.add_argument('--top-k', type=int, default=1,
+                    help='number of top submitters per day of Query 3 (default 1)')
+parser.add_argument('--engine', choices=['stream', 'numpy', 'sketch'], default='stream',
+                    help='stream: single pass over the rows with Python aggregates (default), '
+                         'numpy: vectorized queries over NumPy arrays (see numpy_engine.py), '
+                         'sketch: approximate Queries 1-3 from mergeable sketches with error bounds '
+                         '(see approximate.py)')
+parser.add_argument('--state', metavar='PATH',
+                    help='incremental mode: keep the aggregated state in this snapshot file '
+                         'and only ingest the rows appended since the last run')
+parser.add_argument('--rebuild', action='store_true',
+                    help='discard the snapshot given by --state and ingest all rows again')
+parser.add_argument('--workers', type=int, default=1,
+                    help='parallel mode: number of worker processes of the stream engine (see parallel.py)')
+parser.add_argument('--report-from', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                    help='daily report mode: answer Queries 1-3 for the window ending on every date '
+                         'from this date (see sliding.py)')
+parser.add_argument('--report-to', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                    help='last end date of the daily report (default: the last date of data)')
+args = parser.parse_args()
+if args.days < 1 or args.top_k < 1:
+    parser.error('--days and --top-k must be at least 1')
+if args.state and args.engine != 'stream':
+    parser.error('--state is only supported by the stream engine')
+if args.workers > 1 and args.engine == 'numpy':
+    parser.error('--workers is only supported by the stream and sketch engines')
+if args.state and args.workers > 1:
+    parser.error('--state cannot be combined with --workers')
+if args.report_to and not args.report_from:
+    parser.error('--report-to requires --report-from')
+if args.report_from and (args.engine != 'stream' or args.state or args.workers > 1):
+    parser.error('--report-from is only supported by the stream engine without --state and --workers')
 
-# Reads CSV content and returns a list of tuples
-# each tuple representing 1 row from the CSV file
-def read_csv(path):
-    with open(path, newline='') as f:
-        reader = csv.reader(f)
-        data = [tuple(row) for row in reader]
-    return data[1:]  # exclude header
-
-# Read from CSV and remove header
+# --------------------
+# Daily report mode
+# --------------------
+# Queries 1-3 for the window of --days days ending on every date of the
+# range, computed from per-day aggregates with a sliding window.
+if args.report_from:
+    from sliding import DailyAggregates
+    with profiling.stage('load grades'):
+        grades = load_grades()
+    with profiling.stage('aggregate days') as stage:
+        daily = DailyAggregates().consume(load_submissions(), grades)
+        stage.rows_in = daily.rows
+    report.check_rows(daily.rows)
+    first_day = args.report_from.toordinal()
+    last_day = args.report_to.toordinal() if args.report_to else daily.last_day()
+    if first_day > last_day:
+        parser.error('--report-from must not be after the last end date of the report')
+
+    print(f'\nDaily report (window of {args.days} days):')
+    print('-------------------------------------------------------------')
+    print('  end_date | result #1 | result #2 | top student_id | count')
+    print('-------------------------------------------------------------')
+    with profiling.stage('sliding window') as stage:
+        for day, result1, result2, top in daily.reports(first_day, last_day, args.days):
+            print("{} | {} | {} | {} | {}".format(format_day(day),
+                                                  str(result1).rjust(9),
+                                                  str(result2).rjust(9),
+                                                  str(top[0] if top else '-').rjust(14),
+                                                  str(top[1] if top else 0).rjust(5)))
+        stage.rows_out = last_day - first_day + 1
+    print('-------------------------------------------------------------')
+    sys.exit()
+
+# Read from CSV
 # Remark on data optimization:
 # --------------------------------------------------------------
 # Since the data is processed using numeric identifiers,
 # the students and tests are redundant datasets. So, we will
 # only load submissions and grades.
+#
+# The grades are loaded into a compact grade table (see grades.py),
+# while the submissions are streamed: each row is read, cast and
+# joined with its grade exactly once and then it only updates the
+# aggregated state of the four queries (see engine.py).
+#
+# If the columnar cache of the CSV files is fresh, the memory-mapped
+# columns are read instead of the CSV files (see challenge/cache.py).
+# Otherwise, if NumPy is installed, the memory-mapped CSV files are
+# tokenized into the same columns with vectorized operations, block by
+# block (see csvscan.py and sources.py).
+#
+# In incremental mode the aggregated state is loaded from a snapshot
+# and only the rows appended since then are ingested (see incremental.py).
+#
+# In parallel mode the submissions are split into chunks aggregated by
+# worker processes and the partial aggregates are merged (see parallel.py).
+#
+# The numpy engine loads all rows into NumPy arrays instead and answers
+# the queries with vectorized operations (see numpy_engine.py).
+#
+# The sketch engine streams the rows like the stream engine, but keeps
+# fixed-size sketches per day of the window instead of per-student state,
+# and answers Queries 1-3 with estimates and error bounds (see
+# approximate.py); Query 4 stays exact.
 # --------------------------------------------------------------
-submissions = read_csv('submissions.csv') 
-grades = read_csv('grades.csv') 
-
-# Append new columns and apply casting to provide correct data types:
-data = [(int(x[0]),                                    
-         int(x[1]),                                     
-         int(x[2]),                                    
-         datetime.strptime(x[3], '%Y-%m-%d %H:%M:%S'),  
-         datetime.strptime(x[3][:10], '%Y-%m-%d'))      
-        for x in submissions]
-
-# Validate
-if len(data) == 0:
-    raise Exception('At least one CSV file is empty. Processing interrupted. Please provide non-empty CSV files.')
-
-# Convert grades to dictionary
-grades = dict([(int(row[0]), 
-                int(row[1])) for row in grades])
-
-# Append grade to submissions -> data:
-# --------------------------------------
-#   data[0] -> submission_id
-#   data[1] -> test_id
-#   data[2] -> student_id
-#   data[3] -> submission_time
-#   data[4] -> submission_date
-#   data[5] -> grade
-# --------------------------------------
-# Note: If a grade does not exist, the default 0 value is assigned.
-data = [(x[0], x[1], x[2], x[3], x[4], grades.get(x[0], 0)) for x in data]
-
-# Sort data by submission_date descending
-data.sort(key=lambda x: x[4], reverse=True)
-
-# Calculate submission_start to filter data by last CONSECUTIVE_DAYS
-submission_start = data[0][4] - timedelta(days=CONSECUTIVE_DAYS-1)
-
-# --------------------
-# Query 1 
-# --------------------
-# Steps:
-#   1. Filter by consecutive days
-#   2. Select distinct (student_id, submission_date) rows 
-#   3. Extract only those students whose submission count match CONSECUTIVE_DAYS
-data1 = list(set([(x[2], x[4]) for x in data if x[4] >= submission_start]))
-counter1 = Counter([x[0] for x in data1])
-count1 = 0
-for student_id in counter1:
-    if counter1[student_id] == CONSECUTIVE_DAYS:
-        count1 += 1
-print(f'\nResult #1: {count1}')
-
-# --------------------
-# Query 2
-# --------------------
-# Steps:
-#   1. Filter by consecutive days AND grade > 0 
-#   2. Select distinct (student_id, submission_date) rows 
-#   3. Extract only those students whose submission count match CONSECUTIVE_DAYS
-data2 = list(set([(x[2], x[4]) for x in data if (x[4] >= submission_start and x[5] > 0)]))
-counter2 = Counter([x[0] for x in data2])
-count2 = 0
-for student_id in counter2:
-    if counter2[student_id] == CONSECUTIVE_DAYS:
-        count2 += 1
-print(f'\nResult #1: {count2}')
+if args.engine == 'numpy':
+    from numpy_engine import SubmissionArrays
+    with profiling.stage('load arrays') as stage:
+        cached_grades = cache.load_arrays('.', 'grades')
+        cached_submissions = cache.load_arrays('.', 'submissions')
+        if cached_grades and cached_submissions:
+            aggregates = SubmissionArrays.from_columns(args.days, cached_grades, cached_submissions)
+        else:
+            aggregates = SubmissionArrays.from_csv(args.days, 'grades.csv', 'submissions.csv')
+        stage.rows_out = aggregates.rows
+elif args.workers > 1:
+    from parallel import aggregate_parallel
+    factory = partial(SketchAggregates, top_k=args.top_k) if args.engine == 'sketch' else Aggregates
+    with profiling.stage('aggregate (parallel)') as stage:
+        aggregates = aggregate_parallel('submissions.csv', 'grades.csv', args.days, args.workers,
+                                        factory=factory)
+        stage.rows_in = aggregates.rows
+elif args.state:
+    with profiling.stage('refresh snapshot') as stage:
+        snapshot = Snapshot(args.days) if args.rebuild else load_snapshot(args.state, args.days)
+        rows = snapshot.aggregates.rows
+        snapshot.refresh('submissions.csv', 'grades.csv').save(args.state)
+        aggregates = snapshot.aggregates
+        stage.rows_in = aggregates.rows - rows
+else:
+    with profiling.stage('load grades'):
+        grades = load_grades()
+    # Reading, casting and joining the submissions are fused with the aggregation
+    with profiling.stage('aggregate submissions') as stage:
+        aggregates = SketchAggregates(args.days, args.top_k) if args.engine == 'sketch' else Aggregates(args.days)
+        aggregates.consume(load_submissions(), grades)
+        stage.rows_in = aggregates.rows
+
+# The four queries (see challenge/report.py) are answered like the python
+# backend does (see challenge/backends/python.py). Estimates of the sketch
+# engine are printed with their value, and their errors after the report.
+results = answer(aggregates, args.top_k)
+if args.engine == 'sketch':
+    report.print_results(results._replace(
+        query1=results.query1.value,
+        query2=results.query2.value,
+        query3=[(day, student_id, count.value) for day, student_id, count in results.query3]))
+else:
+    report.print_results(results)
 
 # --------------------
-# Query 3
+# Error bounds
 # --------------------
-# Steps:
-#   1. Filter by consecutive days (use already filtered data1)
-#   2. Select distinct (student_id, submission_date) rows 
-#   3. Extract only those students whose submission count match CONSECUTIVE_DAYS
-data3 = [(x[2], x[4]) for x in data if (x[4] >= submission_start)]
-counter3 = Counter([x for x in data3])
-
-# Sort list of (submission_date, student_id, count) by submission_date ASC, 
-# student_id ASC, count DESC
-# Note using -x[1] to achieve the reverse order of count
-data3_sorted = []
-for x in counter3:
-    data3_sorted.append((x[1], x[0], counter3[x]))
-data3_sorted.sort(key=lambda x: (x[0], -x[2], x[1]), reverse=False)
-
-# For each submission_date, select first row from the sorted list
-result3 = []
-prev_submission_date = None
-for x in data3_sorted:
-    submission_date, student_id, count = x
-    if (prev_submission_date is None) or (submission_date > prev_submission_date):
-        result3.append((submission_date, student_id, count))
-        prev_submission_date = submission_date
-        
-print(f'\nResult #3:')
-print('------------------------------------')
-print('submission_date | student_id | count')
-print('------------------------------------')
-for row in result3:
-    print("{} | {} | {}".format(row[0].strftime('%Y-%m-%d').ljust(15), 
-                                str(row[1]).rjust(10),
-                                str(row[2]).rjust(5)))
-print('------------------------------------')        
-
-# --------------------
-# Query 4
-# --------------------
-# Steps:
-#   1. Calculate the total grade per (student_id, test_id) -> needed in the next step.
-#   2. Split data into 2 subsets:
-#      - invalid_submissions: all submissions per (student_id, test_id) are invalid (grade=0) 
-#        -> take distinct (student_id, test_id) rows with grade=0
-#      - last_valid_submission: at least one submission is valid
-#        -> take last valid submission per (student_id, test_id)
-#   3. Union both subsets and compute the grade average per test_id.
-
-# Calculate total grade per (test, student) group and store them into a dictionary
-data4 = [(x[1], x[2], x[5]) for x in data]
-data4.sort(key=lambda x: (x[0], x[1]))
-total_grades = {(test_id, student_id): sum(item[2] for item in group) for (test_id, student_id), group 
-                in itertools.groupby(data4, key=lambda x: (x[0], x[1]))}
-
-# Process invalid submissions
-invalid_submissions = list(set([x for x in data4 if total_grades[(x[0], x[1])] == 0]))
-
-# Extract valid submissions
-valid_submissions = [(x[1], x[2], x[3], x[5]) for x in data 
-                        if (total_grades[(x[1], x[2])] > 0) and (x[5] > 0)]
-
-# Sort the list by date in descending order
-valid_submissions.sort(key=lambda x: x[2], reverse=True)
-
-# Extract only most recent submissions
-valid_submissions_extract = []
-seen = set()
-for x in valid_submissions:
-    test_id, student_id, _, grade = x
-    if (test_id, student_id) not in seen:
-        seen.add((test_id, student_id))
-        valid_submissions_extract.append((test_id, student_id, grade))
-        
-# Create a union of both lists
-union_submissions = valid_submissions_extract + invalid_submissions
-        
-# Compute average 
-union_submissions.sort(key=lambda x: x[0])
-result4 = []
-for test_id, group in itertools.groupby(union_submissions, key=lambda x: x[0]):
-    grades = [item[2] for item in group]
-    result4.append((test_id, sum(grades) / len(grades)))
-
-# Output
-print(f'\nResult #4:')
-print('-------------------')
-print('test_id | avg_grade')
-print('-------------------')
-for row in result4:
-    print("{} | {:.2f}".format(str(row[0]).rjust(7),
-                               round(row[1], 2)))
-print('-------------------')
-
-
-
+# Queries 1 and 2 are within the error of the estimate (about 95%), the
+# counts of Query 3 overestimate by at most the error of their day, and
+# the distinct (valid) submitters of every day come from HyperLogLogs.
+if args.engine == 'sketch':
+    print(f'\nError bounds (sketch engine):')
+    print(f'Query 1: +/- {results.query1.error}')
+    print(f'Query 2: +/- {results.query2.error}')
+    print('--------------------------------------------------------------------------')
+    print('submission_date |   submitters (+/-) | valid submitters (+/-) | count error')
+    print('--------------------------------------------------------------------------')
+    for day, submitters, valid, error in aggregates.daily():
+        print("{} | {} | {} | {}".format(format_day(day).ljust(15),
+                                         f'{submitters.value} ({submitters.error})'.rjust(18),
+                                         f'{valid.value} ({valid.error})'.rjust(22),
+                                         str(error).rjust(11)))
+    print('--------------------------------------------------------------------------')
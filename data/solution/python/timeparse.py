@@ -0,0 +1,37 @@
+from datetime import date
+
+# --------------------------------------------------------------
+# Fixed-format timestamp parser
+# --------------------------------------------------------------
+# The submission times always have the 'YYYY-MM-DD HH:MM:SS' layout,
+# so instead of datetime.strptime (which interprets the format for
+# every call) the fields are sliced at fixed positions and converted
+# into two integers:
+#
+#   day ordinal  -> date.toordinal() of the submission date
+#   epoch second -> seconds since 1970-01-01 00:00:00 (timezone naive)
+#
+# Many rows share the same date and the same hour and minute, so the
+# value of both prefixes is cached. Both caches are bounded: one entry
+# per distinct date and at most 1440 entries for 'HH:MM'.
+# --------------------------------------------------------------
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+_days = {}
+_minutes = {}
+
+# Returns (day ordinal, epoch seconds) of a 'YYYY-MM-DD HH:MM:SS' string
+def parse_timestamp(value):
+    day = _days.get(value[:10])
+    if day is None:
+        ordinal = date(int(value[:4]), int(value[5:7]), int(value[8:10])).toordinal()
+        day = _days[value[:10]] = (ordinal, (ordinal - EPOCH_ORDINAL) * 86400)
+    minute = _minutes.get(value[11:16])
+    if minute is None:
+        minute = _minutes[value[11:16]] = int(value[11:13]) * 3600 + int(value[14:16]) * 60
+    return day[0], day[1] + minute + int(value[17:19])
+
+# Formats a day ordinal as 'YYYY-MM-DD'
+def format_day(ordinal):
+    return date.fromordinal(ordinal).isoformat()
@@ -0,0 +1,352 @@
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import time
+
+# --------------------------------------------------------------
+# Benchmark of query.sql and of its rollup (rollup.sql, report.sql)
+# --------------------------------------------------------------
+# Generates users, products and orders into SQLite, the embedded
+# stand-in for PostgreSQL (it has triggers, UPSERT and covering
+# indexes; DuckDB has no triggers), or into an empty PostgreSQL
+# database with --postgres (requires psycopg 3), and compares:
+#
+#   query.sql          -> the three-way join with the primary keys only
+#   query.sql indexed  -> the same with the indexes of rollup.sql
+#   report.sql         -> the range scan of the rollup
+#
+# query.sql and report.sql are run as they are. On PostgreSQL, so is
+# rollup.sql. On SQLite, the rollup, its triggers and indexes are the
+# SQLite port of rollup.sql below (SQLite has no INCLUDE columns, so
+# they are trailing key columns, and its triggers hold the statements
+# of the PostgreSQL functions).
+#
+# Prints the latency of every query (median and mean of --repeat runs),
+# checks that the reports are equal, then applies a batch of changes
+# through the triggers, times it and checks the reports again: new,
+# deleted and updated orders, and new prices and categories, new,
+# deleted and renumbered products. Some of the new orders are of
+# products inserted afterwards.
+#
+# Prices are multiples of 0.25, which add up exactly in floating point,
+# so the totals of both sides are compared exactly.
+#
+# Usage: python bench_rollup.py [--users N] [--products N] [--orders N]
+#                               [--changes N] [--repeat N]
+#                               [--db PATH | --postgres DSN]
+#
+# With 100k users, 10k products and 2M orders (Python 3.11), 14412 users
+# in the report, in memory with SQLite 3.40 and with --postgres on
+# PostgreSQL 16 (default settings, local socket):
+#
+#   query                    |     SQLite median ms | PostgreSQL median ms
+#   query.sql                |               2504.2 |                679.3
+#   query.sql indexed        |                491.6 |                621.3
+#   report.sql               |                 32.9 |                 81.2
+#
+#   backfill of the rollup   |                6.4 s |               16.6 s
+#   1428 new orders          |           44 us each |          202 us each
+#   1428 deleted orders      |           37 us each |          278 us each
+#   1428 updated orders      |           68 us each |          440 us each
+#   1428 updated products    |         5536 us each |        14932 us each
+#   1428 new products        |           12 us each |           86 us each
+#   1428 deleted products    |         2918 us each |        10478 us each
+#   1428 renumbered products |         3192 us each |        11690 us each
+#
+# A new price, category or id of a product, or its deletion, moves all
+# its orders (200 on average here) between the rows of the rollup, so it
+# costs about as much as changing those orders one by one. A new product
+# only has the few orders inserted before it.
+# --------------------------------------------------------------
+
+SQL_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CATEGORIES = ['Electronics', 'Books', 'Clothing', 'Home', 'Garden',
+              'Toys', 'Sports', 'Beauty', 'Grocery', 'Automotive']
+
+SCHEMA = """
+CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT);
+CREATE TABLE products (id INTEGER PRIMARY KEY, name TEXT, price REAL, category TEXT);
+CREATE TABLE orders (id INTEGER PRIMARY KEY, user_id INTEGER, product_id INTEGER, quantity INTEGER, created_at TEXT);
+"""
+
+POSTGRES_SCHEMA = """
+CREATE TABLE users (id integer PRIMARY KEY, name text, email text);
+CREATE TABLE products (id integer PRIMARY KEY, name text, price numeric(10, 2), category text);
+CREATE TABLE orders (id integer PRIMARY KEY, user_id integer, product_id integer, quantity integer, created_at timestamp);
+"""
+
+# Supporting indexes of query.sql (see rollup.sql)
+QUERY_INDEXES = """
+CREATE INDEX orders_product ON orders (product_id, user_id, quantity);
+CREATE INDEX products_category ON products (category, id, price);
+"""
+
+# The same on PostgreSQL, dropped before rollup.sql creates them again
+POSTGRES_QUERY_INDEXES = """
+CREATE INDEX orders_product ON orders (product_id) INCLUDE (user_id, quantity);
+CREATE INDEX products_category ON products (category) INCLUDE (id, price);
+ANALYZE;
+"""
+
+# SQLite port of rollup.sql
+ROLLUP = """
+CREATE TABLE user_category_totals (
+    user_id INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    order_count INTEGER NOT NULL,
+    total_amount REAL NOT NULL,
+    PRIMARY KEY (user_id, category)
+) WITHOUT ROWID;
+
+CREATE INDEX user_category_totals_report
+    ON user_category_totals (category, total_amount DESC, order_count, user_id);
+-- (users_report is left out: the rows of users are stored by id already)
+
+INSERT INTO user_category_totals (user_id, category, order_count, total_amount)
+SELECT B.user_id, C.category, COUNT(*), SUM(C.price * B.quantity)
+FROM orders AS B
+INNER JOIN products AS C ON B.product_id = C.id
+GROUP BY B.user_id, C.category;
+
+CREATE TRIGGER orders_rollup_insert AFTER INSERT ON orders BEGIN
+    INSERT INTO user_category_totals (user_id, category, order_count, total_amount)
+    SELECT NEW.user_id, category, 1, price * NEW.quantity FROM products WHERE id = NEW.product_id
+    ON CONFLICT (user_id, category) DO UPDATE
+    SET order_count = order_count + excluded.order_count, total_amount = total_amount + excluded.total_amount;
+END;
+
+CREATE TRIGGER orders_rollup_delete AFTER DELETE ON orders BEGIN
+    INSERT INTO user_category_totals (user_id, category, order_count, total_amount)
+    SELECT OLD.user_id, category, -1, -price * OLD.quantity FROM products WHERE id = OLD.product_id
+    ON CONFLICT (user_id, category) DO UPDATE
+    SET order_count = order_count + excluded.order_count, total_amount = total_amount + excluded.total_amount;
+    DELETE FROM user_category_totals WHERE user_id = OLD.user_id AND order_count = 0;
+END;
+
+CREATE TRIGGER orders_rollup_update AFTER UPDATE OF user_id, product_id, quantity ON orders BEGIN
+    INSERT INTO user_category_totals (user_id, category, order_count, total_amount)
+    SELECT OLD.user_id, category, -1, -price * OLD.quantity FROM products WHERE id = OLD.product_id
+    ON CONFLICT (user_id, category) DO UPDATE
+    SET order_count = order_count + excluded.order_count, total_amount = total_amount + excluded.total_amount;
+    INSERT INTO user_category_totals (user_id, category, order_count, total_amount)
+    SELECT NEW.user_id, category, 1, price * NEW.quantity FROM products WHERE id = NEW.product_id
+    ON CONFLICT (user_id, category) DO UPDATE
+    SET order_count = order_count + excluded.order_count, total_amount = total_amount + excluded.total_amount;
+    DELETE FROM user_category_totals WHERE user_id = OLD.user_id AND order_count = 0;
+END;
+
+CREATE TRIGGER products_rollup_insert AFTER INSERT ON products BEGIN
+    INSERT INTO user_category_totals (user_id, category, order_count, total_amount)
+    SELECT user_id, NEW.category, COUNT(*), SUM(NEW.price * quantity)
+    FROM orders WHERE product_id = NEW.id GROUP BY user_id
+    ON CONFLICT (user_id, category) DO UPDATE
+    SET order_count = order_count + excluded.order_count, total_amount = total_amount + excluded.total_amount;
+END;
+
+CREATE TRIGGER products_rollup_delete AFTER DELETE ON products BEGIN
+    INSERT INTO user_category_totals (user_id, category, order_count, total_amount)
+    SELECT user_id, OLD.category, -COUNT(*), -SUM(OLD.price * quantity)
+    FROM orders WHERE product_id = OLD.id GROUP BY user_id
+    ON CONFLICT (user_id, category) DO UPDATE
+    SET order_count = order_count + excluded.order_count, total_amount = total_amount + excluded.total_amount;
+    DELETE FROM user_category_totals WHERE category = OLD.category AND order_count = 0
+        AND user_id IN (SELECT user_id FROM orders WHERE product_id = OLD.id);
+END;
+
+CREATE TRIGGER products_rollup_update AFTER UPDATE OF id, price, category ON products BEGIN
+    INSERT INTO user_category_totals (user_id, category, order_count, total_amount)
+    SELECT user_id, category, SUM(order_count), SUM(total_amount)
+    FROM (
+        SELECT user_id, OLD.category AS category, -COUNT(*) AS order_count, -SUM(OLD.price * quantity) AS total_amount
+        FROM orders WHERE product_id = OLD.id GROUP BY user_id
+        UNION ALL
+        SELECT user_id, NEW.category, COUNT(*), SUM(NEW.price * quantity)
+        FROM orders WHERE product_id = NEW.id GROUP BY user_id
+    )
+    GROUP BY user_id, category
+    ON CONFLICT (user_id, category) DO UPDATE
+    SET order_count = order_count + excluded.order_count, total_amount = total_amount + excluded.total_amount;
+    DELETE FROM user_category_totals WHERE category = OLD.category AND order_count = 0
+        AND user_id IN (SELECT user_id FROM orders WHERE product_id = OLD.id);
+END;
+"""
+
+
+# The rollup recomputed from the orders, and as maintained
+RECOUNT = """
+SELECT B.user_id, C.category, COUNT(*), SUM(C.price * B.quantity)
+FROM orders AS B
+INNER JOIN products AS C ON B.product_id = C.id
+GROUP BY B.user_id, C.category
+"""
+ROLLUP_ROWS = 'SELECT user_id, category, order_count, total_amount FROM user_category_totals'
+
+
+def read_query(name):
+    with open(os.path.join(SQL_DIR, name)) as f:
+        return f.read().strip().rstrip(';')
+
+# Runs statements separated by semicolons
+def execute_script(con, script):
+    if isinstance(con, sqlite3.Connection):
+        con.executescript(script)
+    else:
+        con.execute(script)
+
+# Runs a statement with ? parameters for every row
+def execute_many(con, sql, rows):
+    if not isinstance(con, sqlite3.Connection):
+        sql = sql.replace('?', '%s')
+    con.cursor().executemany(sql, rows)
+
+# Price of a product: a multiple of 0.25 between 0.25 and about 3000
+def random_price(rng):
+    return max(round(rng.lognormvariate(4, 1.3) * 4), 1) / 4
+
+def random_order(rng, order_id, users, products):
+    return (order_id,
+            rng.randint(1, users),
+            rng.randint(1, products),
+            rng.randint(1, 5),
+            f'2023-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:00:00')
+
+def random_product(rng, product_id):
+    return product_id, f'Product {product_id}', random_price(rng), rng.choice(CATEGORIES)
+
+def generate(con, rng, users, products, orders):
+    execute_many(con, 'INSERT INTO users VALUES (?, ?, ?)',
+                 ((i, f'User {i}', f'user{i}@example.com') for i in range(1, users + 1)))
+    execute_many(con, 'INSERT INTO products VALUES (?, ?, ?, ?)',
+                 (random_product(rng, i) for i in range(1, products + 1)))
+    execute_many(con, 'INSERT INTO orders VALUES (?, ?, ?, ?, ?)',
+                 (random_order(rng, i, users, products) for i in range(1, orders + 1)))
+    con.commit()
+
+# Applies a batch of changes through the triggers: a seventh each of new
+# orders, deleted orders, orders with a new product and quantity, new
+# prices and categories of products, new products, deleted products and
+# products with a new id. The new orders are of products up to the ids of
+# the new and renumbered products, so some of them have no product until
+# it is inserted or renumbered. Returns (change, count, seconds) of every
+# kind of change.
+def apply_changes(con, rng, changes, users, products, orders):
+    count = changes // 7
+    removed = rng.sample(range(1, products + 1), min(2 * count, products))
+    batches = [
+        ('new orders', 'INSERT INTO orders VALUES (?, ?, ?, ?, ?)',
+         [random_order(rng, orders + i, users, products + 2 * count) for i in range(1, count + 1)]),
+        ('deleted orders', 'DELETE FROM orders WHERE id = ?',
+         [(i,) for i in rng.sample(range(1, orders + 1), count)]),
+        ('updated orders', 'UPDATE orders SET product_id = ?, quantity = ? WHERE id = ?',
+         [(rng.randint(1, products), rng.randint(1, 5), rng.randint(1, orders)) for _ in range(count)]),
+        ('updated products', 'UPDATE products SET price = ?, category = ? WHERE id = ?',
+         [(random_price(rng), rng.choice(CATEGORIES), rng.randint(1, products)) for _ in range(count)]),
+        ('new products', 'INSERT INTO products VALUES (?, ?, ?, ?)',
+         [random_product(rng, products + i) for i in range(1, count + 1)]),
+        ('deleted products', 'DELETE FROM products WHERE id = ?',
+         [(i,) for i in removed[::2]]),
+        ('renumbered products', 'UPDATE products SET id = ? WHERE id = ?',
+         [(products + count + i, old_id) for i, old_id in enumerate(removed[1::2], 1)]),
+    ]
+    timings = []
+    for name, sql, rows in batches:
+        started = time.perf_counter()
+        execute_many(con, sql, rows)
+        con.commit()
+        timings.append((name, len(rows), time.perf_counter() - started))
+    return timings
+
+# (median ms, mean ms, rows) of repeated runs of a query
+def latency(con, sql, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = con.execute(sql).fetchall()
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times), statistics.mean(times), rows
+
+# The reports are equal if they hold the same rows in the same order of
+# total_amount (the order of equal totals is not defined)
+def same_report(expected, actual):
+    return sorted(expected) == sorted(actual) and [r[2] for r in expected] == [r[2] for r in actual]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--products', type=int, default=10_000)
+    parser.add_argument('--orders', type=int, default=2_000_000)
+    parser.add_argument('--changes', type=int, default=10_000, help='changes applied through the triggers (default 10000)')
+    parser.add_argument('--repeat', type=int, default=10, help='runs per query (default 10)')
+    parser.add_argument('--db', default=':memory:', help='SQLite database file (default: in memory)')
+    parser.add_argument('--postgres', metavar='DSN', help='run on this empty PostgreSQL database instead, with rollup.sql')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if args.db != ':memory:' and os.path.exists(args.db):
+        parser.error(f'{args.db} already exists')
+    if min(args.users, args.products, args.orders, args.repeat) < 1:
+        parser.error('--users, --products, --orders and --repeat must be at least 1')
+    if args.changes < 7:
+        parser.error('--changes must be at least 7 (one of each kind of change)')
+
+    rng = random.Random(args.seed)
+    query, report = read_query('query.sql'), read_query('report.sql')
+    if args.postgres:
+        import psycopg
+        con = psycopg.connect(args.postgres)
+        execute_script(con, POSTGRES_SCHEMA)
+    else:
+        con = sqlite3.connect(args.db)
+        execute_script(con, SCHEMA)
+    generate(con, rng, args.users, args.products, args.orders)
+
+    if args.postgres:
+        execute_script(con, 'ANALYZE')
+    results = [('query.sql',) + latency(con, query, args.repeat)]
+    execute_script(con, POSTGRES_QUERY_INDEXES if args.postgres else QUERY_INDEXES)
+    results.append(('query.sql indexed',) + latency(con, query, args.repeat))
+    started = time.perf_counter()
+    if args.postgres:
+        execute_script(con, 'DROP INDEX orders_product, products_category')
+        execute_script(con, read_query('rollup.sql'))
+        execute_script(con, 'ANALYZE')
+        con.commit()
+    else:
+        execute_script(con, ROLLUP)
+    backfill = time.perf_counter() - started
+    results.append(('report.sql',) + latency(con, report, args.repeat))
+
+    print('-----------------------------------------------')
+    print('query                    |  median ms |    mean ms')
+    print('-----------------------------------------------')
+    for name, median, mean, _ in results:
+        print("{} | {} | {}".format(name.ljust(24), f'{median:.1f}'.rjust(10), f'{mean:.1f}'.rjust(10)))
+    print('-----------------------------------------------')
+    expected, actual = results[0][3], results[2][3]
+    print(f'\nbackfill of the rollup: {backfill:.1f} s')
+    print(f'reports equal: {same_report(expected, actual)} ({len(expected)} users)')
+
+    print()
+    for name, count, seconds in apply_changes(con, rng, args.changes, args.users, args.products, args.orders):
+        # Fewer products than changes leave none to renumber
+        each = f'{seconds / count * 1e6:.0f} us each' if count else '-'
+        print(f'{count} {name} through the triggers: {seconds:.2f} s ({each})')
+    expected, actual = con.execute(query).fetchall(), con.execute(report).fetchall()
+    print(f'reports equal after the changes: {same_report(expected, actual)} ({len(expected)} users)')
+    expected, actual = con.execute(RECOUNT).fetchall(), con.execute(ROLLUP_ROWS).fetchall()
+    print(f'rollup equal to a recount: {sorted(expected) == sorted(actual)} ({len(expected)} rows)')
+
+    for name, sql in [('query.sql', query), ('report.sql', report)]:
+        print(f'\nQuery plan of {name}:')
+        if args.postgres:
+            for row in con.execute(f'EXPLAIN {sql}'):
+                print(f'  {row[0]}')
+        else:
+            for row in con.execute(f'EXPLAIN QUERY PLAN {sql}'):
+                print(f'  {row[3]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+-- query.sql answered from the rollup of rollup.sql: an index range scan of
+-- user_category_totals_report joined with the covering index of users
+SELECT A.name
+	, A.email
+	, T.total_amount
+FROM user_category_totals AS T
+INNER JOIN users AS A ON A.id = T.user_id
+WHERE T.category = 'Electronics'
+	AND T.total_amount > 1000
+	AND T.order_count >= 3
+ORDER BY T.total_amount DESC;
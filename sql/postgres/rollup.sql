@@ -0,0 +1,164 @@
+-- ----------------------------------------------------------------
+-- Rollup of the orders per (user, category)
+-- ----------------------------------------------------------------
+-- query.sql joins users, orders and products on every execution.
+-- user_category_totals keeps the order count and the spend of every
+-- (user, category) instead, so the report (report.sql) is a range scan
+-- of one index joined with the users by id.
+--
+-- The rollup is maintained by triggers in the transaction of every
+-- change of orders (insert, delete, update of user_id, product_id or
+-- quantity) and of products (insert, delete, update of id, price or
+-- category). Every change is applied as a delta with INSERT ... ON
+-- CONFLICT DO UPDATE, which locks the (user, category) row, so
+-- concurrent orders of the same user add up. Rows whose order count
+-- drops to 0 are deleted.
+--
+-- There is no foreign key from orders to products: like the inner join
+-- of query.sql, the rollup counts the orders whose product exists. An
+-- order of a missing product is added when the product is inserted (or
+-- renumbered to its id), and the orders of a deleted (or renumbered)
+-- product are removed. An order and its product inserted by concurrent
+-- transactions do not see each other, so insert the product first or
+-- in the same transaction.
+--
+-- The backfill runs in the transaction that creates the triggers,
+-- with orders and products locked against writes, so no order is
+-- missed or counted twice. Requires PostgreSQL 11 (INCLUDE, EXECUTE
+-- FUNCTION).
+--
+-- Benchmark and check of the rollup: python bench_rollup.py --postgres DSN
+-- (or without --postgres on its SQLite port)
+-- ----------------------------------------------------------------
+
+BEGIN;
+
+LOCK TABLE orders, products IN SHARE ROW EXCLUSIVE MODE;
+
+CREATE TABLE user_category_totals (
+	user_id integer NOT NULL
+	, category text NOT NULL
+	, order_count bigint NOT NULL
+	, total_amount numeric NOT NULL
+	, PRIMARY KEY (user_id, category)
+);
+
+-- Report: the users of a category above a spend, in descending order of
+-- spend, read from the index only
+CREATE INDEX user_category_totals_report
+	ON user_category_totals (category, total_amount DESC) INCLUDE (order_count, user_id);
+
+-- Report: the name and email of a user without reading the table
+CREATE INDEX users_report ON users (id) INCLUDE (name, email);
+
+-- Triggers of products and query.sql: the orders of a product
+CREATE INDEX orders_product ON orders (product_id) INCLUDE (user_id, quantity);
+
+-- query.sql: the products of a category
+CREATE INDEX products_category ON products (category) INCLUDE (id, price);
+
+-- Adds (sign 1) or removes (sign -1) an order to the rollup
+CREATE FUNCTION user_category_totals_apply(p_user_id integer, p_product_id integer, p_quantity integer, p_sign integer)
+RETURNS void AS $$
+	INSERT INTO user_category_totals AS T (user_id, category, order_count, total_amount)
+	SELECT p_user_id
+		, C.category
+		, p_sign
+		, p_sign * C.price * p_quantity
+	FROM products AS C
+	WHERE C.id = p_product_id
+	ON CONFLICT (user_id, category) DO UPDATE
+	SET order_count = T.order_count + EXCLUDED.order_count
+		, total_amount = T.total_amount + EXCLUDED.total_amount;
+
+	DELETE FROM user_category_totals
+	WHERE user_id = p_user_id
+		AND order_count = 0;
+$$ LANGUAGE sql;
+
+CREATE FUNCTION orders_rollup() RETURNS trigger AS $$
+BEGIN
+	IF TG_OP IN ('UPDATE', 'DELETE') THEN
+		PERFORM user_category_totals_apply(OLD.user_id, OLD.product_id, OLD.quantity, -1);
+	END IF;
+	IF TG_OP IN ('INSERT', 'UPDATE') THEN
+		PERFORM user_category_totals_apply(NEW.user_id, NEW.product_id, NEW.quantity, 1);
+	END IF;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER orders_rollup
+	AFTER INSERT OR DELETE OR UPDATE OF user_id, product_id, quantity ON orders
+	FOR EACH ROW EXECUTE FUNCTION orders_rollup();
+
+-- A change of a product moves the spend of all its orders: the
+-- contribution of the orders of the old row is removed and that of the
+-- orders of the new row added, per user (aggregated first, as ON
+-- CONFLICT can update a row only once). An inserted product has no old
+-- row and a deleted one no new row: their id is left NULL, which
+-- matches no order.
+CREATE FUNCTION products_rollup() RETURNS trigger AS $$
+DECLARE
+	old_id products.id%TYPE;
+	old_price products.price%TYPE;
+	old_category products.category%TYPE;
+	new_id products.id%TYPE;
+	new_price products.price%TYPE;
+	new_category products.category%TYPE;
+BEGIN
+	IF TG_OP IN ('UPDATE', 'DELETE') THEN
+		old_id := OLD.id;
+		old_price := OLD.price;
+		old_category := OLD.category;
+	END IF;
+	IF TG_OP IN ('INSERT', 'UPDATE') THEN
+		new_id := NEW.id;
+		new_price := NEW.price;
+		new_category := NEW.category;
+	END IF;
+
+	INSERT INTO user_category_totals AS T (user_id, category, order_count, total_amount)
+	SELECT user_id
+		, category
+		, SUM(order_count)
+		, SUM(total_amount)
+	FROM (
+		SELECT B.user_id, old_category AS category, -COUNT(*) AS order_count, -SUM(old_price * B.quantity) AS total_amount
+		FROM orders AS B
+		WHERE B.product_id = old_id
+		GROUP BY B.user_id
+		UNION ALL
+		SELECT B.user_id, new_category, COUNT(*), SUM(new_price * B.quantity)
+		FROM orders AS B
+		WHERE B.product_id = new_id
+		GROUP BY B.user_id
+	) AS D
+	GROUP BY user_id, category
+	ON CONFLICT (user_id, category) DO UPDATE
+	SET order_count = T.order_count + EXCLUDED.order_count
+		, total_amount = T.total_amount + EXCLUDED.total_amount;
+
+	DELETE FROM user_category_totals
+	WHERE category = old_category
+		AND user_id IN (SELECT user_id FROM orders WHERE product_id = old_id)
+		AND order_count = 0;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER products_rollup
+	AFTER INSERT OR DELETE OR UPDATE OF id, price, category ON products
+	FOR EACH ROW EXECUTE FUNCTION products_rollup();
+
+-- Backfill
+INSERT INTO user_category_totals (user_id, category, order_count, total_amount)
+SELECT B.user_id
+	, C.category
+	, COUNT(*)
+	, SUM(C.price * B.quantity)
+FROM orders AS B
+INNER JOIN products AS C ON B.product_id = C.id
+GROUP BY B.user_id, C.category;
+
+COMMIT;